@@ -0,0 +1,28 @@
+"""index reset token expires_at
+
+Revision ID: 4c7e2a9f1b38
+Revises: 9a6e4c0b2f71
+Create Date: 2026-10-17 10:12:31.408215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c7e2a9f1b38'
+down_revision: Union[str, Sequence[str], None] = '9a6e4c0b2f71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_password_reset_tokens_expires_at'), 'password_reset_tokens', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_password_reset_tokens_expires_at'), table_name='password_reset_tokens')
@@ -0,0 +1,36 @@
+"""add updated_at
+
+Revision ID: 5b0f6d2e8c17
+Revises: e19b7f5c2a83
+Create Date: 2026-10-16 14:22:38.671902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b0f6d2e8c17'
+down_revision: Union[str, Sequence[str], None] = 'e19b7f5c2a83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite can only add a NOT NULL column with a constant default, so start
+    # from a placeholder and backfill real values straight away. (Batch mode
+    # would rebuild the tables and drop the expression/DESC indexes.)
+    placeholder = sa.text("'1970-01-01 00:00:00'")
+    op.add_column('users', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=placeholder, nullable=False))
+    op.add_column('posts', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=placeholder, nullable=False))
+    op.execute("UPDATE posts SET updated_at = date_posted")
+    op.execute("UPDATE users SET updated_at = CURRENT_TIMESTAMP")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('posts', 'updated_at')
+    op.drop_column('users', 'updated_at')
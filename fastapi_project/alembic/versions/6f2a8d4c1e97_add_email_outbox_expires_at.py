@@ -0,0 +1,30 @@
+"""add email outbox expires_at
+
+Revision ID: 6f2a8d4c1e97
+Revises: 4c7e2a9f1b38
+Create Date: 2026-10-17 15:40:12.553190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f2a8d4c1e97'
+down_revision: Union[str, Sequence[str], None] = '4c7e2a9f1b38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('email_outbox', sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(op.f('ix_email_outbox_expires_at'), 'email_outbox', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_email_outbox_expires_at'), table_name='email_outbox')
+    op.drop_column('email_outbox', 'expires_at')
@@ -0,0 +1,40 @@
+"""add post counters
+
+Revision ID: 7d3c91a0e5b2
+Revises: 459f8fbdb28d
+Create Date: 2026-10-16 09:12:05.418273
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3c91a0e5b2'
+down_revision: Union[str, Sequence[str], None] = '459f8fbdb28d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('post_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('post_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('post_count', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Backfill counters from the existing posts.
+    op.execute(
+        "UPDATE users SET post_count = "
+        "(SELECT count(*) FROM posts WHERE posts.user_id = users.id)"
+    )
+    op.execute("INSERT INTO post_stats (id, post_count) SELECT 1, count(*) FROM posts")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('post_stats')
+    op.drop_column('users', 'post_count')
@@ -0,0 +1,28 @@
+"""index user image_file
+
+Revision ID: 9a6e4c0b2f71
+Revises: f3b7c2d18e05
+Create Date: 2026-10-16 23:04:52.671390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a6e4c0b2f71'
+down_revision: Union[str, Sequence[str], None] = 'f3b7c2d18e05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_users_image_file'), 'users', ['image_file'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_users_image_file'), table_name='users')
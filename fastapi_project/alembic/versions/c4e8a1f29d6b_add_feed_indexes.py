@@ -0,0 +1,42 @@
+"""add feed indexes
+
+Revision ID: c4e8a1f29d6b
+Revises: 7d3c91a0e5b2
+Create Date: 2026-10-16 11:40:27.903114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a1f29d6b'
+down_revision: Union[str, Sequence[str], None] = '7d3c91a0e5b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_posts_date_posted_id',
+        'posts',
+        [sa.text('date_posted DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+    op.create_index(
+        'ix_posts_user_id_date_posted',
+        'posts',
+        ['user_id', sa.text('date_posted DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+    op.create_index(op.f('ix_password_reset_tokens_user_id'), 'password_reset_tokens', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_password_reset_tokens_user_id'), table_name='password_reset_tokens')
+    op.drop_index('ix_posts_user_id_date_posted', table_name='posts')
+    op.drop_index('ix_posts_date_posted_id', table_name='posts')
@@ -0,0 +1,71 @@
+"""add post search index
+
+Revision ID: d8f3a61c9e42
+Revises: a2d94e7b61f0
+Create Date: 2026-10-16 18:02:41.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f3a61c9e42'
+down_revision: Union[str, Sequence[str], None] = 'a2d94e7b61f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_VECTOR = (
+    "(setweight(to_tsvector('english', title), 'A') || "
+    "setweight(to_tsvector('english', content), 'B'))"
+)
+
+POSTS_FTS_DDL = (
+    "CREATE VIRTUAL TABLE posts_fts USING fts5("
+    "title, content, content='posts', content_rowid='id', tokenize='porter unicode61')",
+    "INSERT INTO posts_fts(posts_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    "CREATE TRIGGER posts_fts_insert AFTER INSERT ON posts BEGIN "
+    "INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content); "
+    "END",
+    "CREATE TRIGGER posts_fts_delete AFTER DELETE ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); "
+    "END",
+    "CREATE TRIGGER posts_fts_update AFTER UPDATE OF title, content ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content); "
+    "END",
+    # Index the posts that already exist.
+    "INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')",
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_context().dialect.name
+    if dialect == 'postgresql':
+        op.create_index(
+            'ix_posts_search',
+            'posts',
+            [sa.text(SEARCH_VECTOR)],
+            unique=False,
+            postgresql_using='gin',
+        )
+    elif dialect == 'sqlite':
+        for statement in POSTS_FTS_DDL:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_context().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_posts_search', table_name='posts')
+    elif dialect == 'sqlite':
+        for trigger in ('posts_fts_insert', 'posts_fts_delete', 'posts_fts_update'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS posts_fts")
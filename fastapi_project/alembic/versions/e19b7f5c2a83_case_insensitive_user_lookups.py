@@ -0,0 +1,63 @@
+"""case insensitive user lookups
+
+Revision ID: e19b7f5c2a83
+Revises: c4e8a1f29d6b
+Create Date: 2026-10-16 13:05:51.226740
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e19b7f5c2a83'
+down_revision: Union[str, Sequence[str], None] = 'c4e8a1f29d6b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _case_duplicates(column: str) -> list[tuple[str, list[tuple[int, str]]]]:
+    rows = op.get_bind().execute(
+        sa.text(
+            f"SELECT id, {column} FROM users WHERE lower({column}) IN ("
+            f"SELECT lower({column}) FROM users GROUP BY lower({column}) HAVING count(*) > 1"
+            f") ORDER BY lower({column}), id"
+        ),
+    ).all()
+    groups: dict[str, list[tuple[int, str]]] = {}
+    for user_id, value in rows:
+        groups.setdefault(value.lower(), []).append((user_id, value))
+    return list(groups.items())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Both steps below fail on a unique violation if two accounts differ only
+    # in case, so refuse up front and say which rows need merging or renaming.
+    problems = [
+        f"  {column} {key!r}: " + ", ".join(f"id={user_id} ({value!r})" for user_id, value in users)
+        for column in ("email", "username")
+        for key, users in _case_duplicates(column)
+    ]
+    if problems:
+        raise RuntimeError(
+            "Users differ only by letter case; rename or merge these accounts, "
+            "then rerun the migration:\n" + "\n".join(problems)
+        )
+
+    # Lookups now compare the stored email directly, so normalize any rows
+    # written before emails were lowercased on the way in.
+    op.execute("UPDATE users SET email = lower(email) WHERE email <> lower(email)")
+    op.create_index(
+        'ix_users_username_lower',
+        'users',
+        [sa.text('lower(username)')],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_username_lower', table_name='users')
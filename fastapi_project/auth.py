@@ -4,13 +4,17 @@ import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from pwdlib import PasswordHash
-from sqlalchemy import select
+from sqlalchemy import inspect, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from concurrent.futures import ThreadPoolExecutor
 from datetime import UTC, datetime, timedelta
 
 import models
+from cache_utils import TTLCache
 from config import settings
 from database import get_db
+from executor_utils import BoundedExecutor
 
 import hashlib
 import secrets
@@ -20,6 +24,12 @@ password_hash = PasswordHash.recommended()
 
 oauth2_schema = OAuth2PasswordBearer(tokenUrl="api/users/token")
 
+# Per-process caches for get_current_user: token -> subject, and user id -> column
+# values of the users row. Each worker holds its own copy, so the TTL bounds how
+# long another worker can serve a row that was changed elsewhere.
+token_cache = TTLCache(settings.auth_cache_max_entries, settings.auth_cache_ttl_seconds)
+user_cache = TTLCache(settings.auth_cache_max_entries, settings.auth_cache_ttl_seconds)
+
 # entry point for passwords, return hash.
 def hash_password(password: str) -> str:
     return password_hash.hash(password)
@@ -27,6 +37,24 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return password_hash.verify(plain_password, hashed_password)
 
+# argon2 releases the GIL while hashing, so a small dedicated thread pool keeps
+# the event loop free and caps how many hashes compete for CPU at once.
+password_hash_executor = BoundedExecutor(
+    "password-hash",
+    ThreadPoolExecutor(
+        max_workers=settings.password_hash_workers,
+        thread_name_prefix="password-hash",
+    ),
+    max_workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue,
+)
+
+async def hash_password_async(password: str) -> str:
+    return await password_hash_executor.run(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hash_executor.run(verify_password, plain_password, hashed_password)
+
 def generate_password_reset_token() -> str:
     """Generate a secure random token for password reset."""
     return secrets.token_urlsafe(32)
@@ -54,6 +82,10 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
 
 def verify_access_token(token: str) -> str | None:
     """Verify a JWT access token and return the subject if valid."""
+    subject = token_cache.get(token)
+    if subject is not None:
+        return subject
+
     try:
         payload = jwt.decode(
             token,
@@ -63,8 +95,29 @@ def verify_access_token(token: str) -> str | None:
         )
     except jwt.InvalidTokenError:
         return None
-    else:
-        return payload.get("sub")
+
+    subject = payload.get("sub")
+    if subject is not None:
+        # Never keep a token in the cache past its own expiry.
+        token_cache.set(
+            token,
+            subject,
+            ttl_seconds=payload["exp"] - datetime.now(UTC).timestamp(),
+        )
+    return subject
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    """Drop a cached users row; call after any change to that user is committed."""
+    user_cache.pop(user_id)
+
+
+def auth_cache_stats() -> dict[str, dict[str, int | float]]:
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
+
+
+def _user_snapshot(user: models.User) -> dict:
+    return {attr.key: getattr(user, attr.key) for attr in inspect(models.User).column_attrs}
 
 
 async def get_current_user(
@@ -90,6 +143,14 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    snapshot = user_cache.get(user_id_int)
+    if snapshot is not None:
+        # Rebuild the row and attach it to this request's session without a SELECT,
+        # so handlers can still modify and commit current_user as usual.
+        cached_user = models.User(**snapshot)
+        make_transient_to_detached(cached_user)
+        return await db.merge(cached_user, load=False)
+
     result = await db.execute(
         select(models.User).where(models.User.id == user_id_int),
     )
@@ -100,6 +161,7 @@ async def get_current_user(
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    user_cache.set(user_id_int, _user_snapshot(user))
     return user
 
 
@@ -0,0 +1,35 @@
+"""Micro-benchmarks. Run from the project root, e.g. python -m benchmarks.batch_posts
+
+Each benchmark runs against a throwaway SQLite database. Call
+use_scratch_database() before importing any application module, because
+database.py builds its engine from settings at import time.
+"""
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+
+def use_scratch_database() -> str:
+    scratch_dir = tempfile.mkdtemp(prefix="benchmark_")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{scratch_dir}/benchmark.db"
+    return os.environ["DATABASE_URL"]
+
+
+async def create_schema() -> None:
+    import models  # noqa: F401
+    from counters import reconcile_post_counts
+    from database import AsyncSessionLocal, Base, engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        await reconcile_post_counts(db)
+        await db.commit()
+
+
+@contextmanager
+def timer(results: dict, name: str):
+    started = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - started
@@ -0,0 +1,56 @@
+"""Compare POST /api/posts one at a time with POST /api/posts/batch."""
+import asyncio
+
+from benchmarks import create_schema, timer, use_scratch_database
+
+use_scratch_database()
+
+import httpx  # noqa: E402
+
+from main import app  # noqa: E402
+from schemas import MAX_BATCH_POSTS  # noqa: E402
+
+POSTS = 2000
+PASSWORD = "BenchmarkPassword1!"
+
+
+async def main() -> None:
+    await create_schema()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+        await client.post(
+            "/api/users",
+            json={"username": "bench", "email": "bench@example.com", "password": PASSWORD},
+        )
+        token = (
+            await client.post(
+                "/api/users/token",
+                data={"username": "bench@example.com", "password": PASSWORD},
+            )
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        posts = [{"title": f"Post {i}", "content": "Benchmark content. " * 20} for i in range(POSTS)]
+
+        results: dict[str, float] = {}
+        with timer(results, "single"):
+            for post in posts:
+                response = await client.post("/api/posts/", json=post, headers=headers)
+                response.raise_for_status()
+
+        with timer(results, "batch"):
+            for start in range(0, POSTS, MAX_BATCH_POSTS):
+                response = await client.post(
+                    "/api/posts/batch",
+                    json={"posts": posts[start:start + MAX_BATCH_POSTS]},
+                    headers=headers,
+                )
+                response.raise_for_status()
+
+    print(f"{POSTS} posts, batches of {MAX_BATCH_POSTS}")
+    for name, seconds in results.items():
+        print(f"  {name:>6}: {seconds:7.3f}s  {POSTS / seconds:9.0f} posts/s")
+    print(f"  speedup: {results['single'] / results['batch']:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""Compression ratio and CPU time per encoding and level for the feed JSON and home page.
+
+Use it to pick settings.compression_levels. Needs brotli and zstandard for
+those rows; missing encodings are skipped.
+"""
+import asyncio
+import random
+import time
+from datetime import UTC, datetime, timedelta
+
+from benchmarks import create_schema, use_scratch_database
+
+use_scratch_database()
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+import models  # noqa: E402
+from compression import ENCODINGS, compress  # noqa: E402
+from counters import reconcile_post_counts  # noqa: E402
+from database import AsyncSessionLocal  # noqa: E402
+from main import app  # noqa: E402
+
+POSTS = 100
+ROUNDS = 20
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 5, 8, 11), "zstd": (1, 3, 6, 12)}
+WORDS = (
+    "async database session query index cursor page cache request response "
+    "latency throughput python fastapi template render image upload token "
+    "password email search rank highlight feed post author like comment"
+).split()
+
+
+async def seed() -> None:
+    await create_schema()
+    rng = random.Random(0)
+    now = datetime.now(UTC)
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            insert(models.User),
+            [{"username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"} for i in range(10)],
+        )
+        await db.execute(
+            insert(models.Post),
+            [
+                {
+                    "title": " ".join(rng.choices(WORDS, k=6)).capitalize(),
+                    "content": " ".join(rng.choices(WORDS, k=rng.randint(100, 600))),
+                    "user_id": i % 10 + 1,
+                    "date_posted": now - timedelta(minutes=i),
+                }
+                for i in range(POSTS)
+            ],
+        )
+        await reconcile_post_counts(db)
+        await db.commit()
+
+
+async def main() -> None:
+    await seed()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+        headers = {"Accept-Encoding": "identity"}
+        bodies = {
+            f"GET /api/posts/?limit={POSTS}": (await client.get(f"/api/posts/?limit={POSTS}", headers=headers)).content,
+            "GET / (home.html)": (await client.get("/", headers=headers)).content,
+        }
+
+    for name, body in bodies.items():
+        print(f"{name}: {len(body) / 1024:.1f} KiB uncompressed")
+        for encoding in ENCODINGS:
+            for level in LEVELS[encoding]:
+                started = time.thread_time()
+                for _ in range(ROUNDS):
+                    compressed = compress(encoding, level, body)
+                cpu_ms = (time.thread_time() - started) / ROUNDS * 1000
+                print(
+                    f"  {encoding:>4} {level:>2}: {len(compressed) / 1024:7.1f} KiB  "
+                    f"ratio {len(body) / len(compressed):5.2f}  {cpu_ms:6.2f}ms CPU",
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
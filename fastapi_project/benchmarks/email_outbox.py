@@ -0,0 +1,110 @@
+"""Drain the email outbox into a local aiosmtpd server and compare with one connection per message.
+
+Needs aiosmtpd (pip install aiosmtpd). The first drain runs with the server
+down, so every message is scheduled for a retry; the second delivers them all.
+"""
+import asyncio
+import os
+import socket
+from datetime import UTC, datetime, timedelta
+
+from benchmarks import create_schema, timer, use_scratch_database
+
+use_scratch_database()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+os.environ.update(MAIL_SERVER="127.0.0.1", MAIL_PORT=str(free_port()), MAIL_USE_TLS="false")
+
+import aiosmtplib  # noqa: E402
+from aiosmtpd.controller import Controller  # noqa: E402
+from sqlalchemy import func, select, update  # noqa: E402
+
+import models  # noqa: E402
+from config import settings  # noqa: E402
+from database import AsyncSessionLocal, engine  # noqa: E402
+from email_outbox import email_outbox  # noqa: E402
+from email_utils import build_message, queue_password_reset_email  # noqa: E402
+
+MESSAGES = 500
+
+
+class CountingHandler:
+    def __init__(self) -> None:
+        self.connections = 0
+        self.messages = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        return "250 Message accepted for delivery"
+
+
+async def queue_messages(count: int) -> None:
+    expires_at = datetime.now(UTC) + timedelta(hours=1)
+    async with AsyncSessionLocal() as db:
+        for i in range(count):
+            queue_password_reset_email(db, f"user{i}@example.com", f"user{i}", f"token-{i}", expires_at)
+        await db.commit()
+
+
+async def pending() -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(models.EmailOutbox))
+
+
+async def main() -> None:
+    await create_schema()
+    handler = CountingHandler()
+    results: dict[str, float] = {}
+
+    # Old path: aiosmtplib.send opens a new connection for every message.
+    controller = Controller(handler, hostname=settings.mail_server, port=settings.mail_port)
+    controller.start()
+    with timer(results, "per-message connections"):
+        for i in range(MESSAGES):
+            await aiosmtplib.send(
+                build_message(f"user{i}@example.com", "Benchmark", "Hello"),
+                hostname=settings.mail_server,
+                port=settings.mail_port,
+                start_tls=False,
+            )
+    direct_connections = handler.connections
+    controller.stop()
+
+    await queue_messages(MESSAGES)
+    await email_outbox.drain()
+    print(f"server down: {email_outbox.retried} messages scheduled for retry, {await pending()} left in outbox")
+
+    # Make the retries due now rather than after the backoff delay.
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(models.EmailOutbox).values(next_attempt_at=func.now()))
+        await db.commit()
+
+    handler.connections = handler.messages = 0
+    controller = Controller(handler, hostname=settings.mail_server, port=settings.mail_port)
+    controller.start()
+    with timer(results, "outbox + pooled SMTP"):
+        sent = await email_outbox.drain()
+    await email_outbox.pool.close()
+    controller.stop()
+    print(f"server up:   {sent} sent, {await pending()} left in outbox\n")
+
+    print(f"{MESSAGES} messages, pool size {settings.mail_pool_size}, batches of {settings.mail_outbox_batch_size}")
+    connections = {"per-message connections": direct_connections, "outbox + pooled SMTP": handler.connections}
+    for name, seconds in results.items():
+        print(f"  {name:>24}: {seconds:7.3f}s  {MESSAGES / seconds:7.0f} msg/s  {connections[name]:4} connections")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
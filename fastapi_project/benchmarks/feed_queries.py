@@ -0,0 +1,79 @@
+"""Database round trips per request for the four feed entry points."""
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+from benchmarks import create_schema, use_scratch_database
+
+use_scratch_database()
+
+import httpx  # noqa: E402
+from sqlalchemy import event, insert  # noqa: E402
+
+import models  # noqa: E402
+from counters import reconcile_post_counts  # noqa: E402
+from database import AsyncSessionLocal, engine  # noqa: E402
+from main import app  # noqa: E402
+from page_cache import page_cache  # noqa: E402
+
+USERS = 10
+POSTS = 200
+
+
+async def seed() -> None:
+    await create_schema()
+    now = datetime.now(UTC)
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            insert(models.User),
+            [
+                {"username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"}
+                for i in range(1, USERS + 1)
+            ],
+        )
+        await db.execute(
+            insert(models.Post),
+            [
+                {
+                    "title": f"Post {i}",
+                    "content": "content",
+                    "user_id": i % USERS + 1,
+                    "date_posted": now - timedelta(minutes=i),
+                }
+                for i in range(POSTS)
+            ],
+        )
+        await reconcile_post_counts(db)
+        await db.commit()
+
+
+async def main() -> None:
+    await seed()
+
+    statements: list[str] = []
+
+    def count(_conn, _cursor, statement, *_args) -> None:
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+        cursor = (await client.get("/api/posts/", params={"limit": 10})).json()["next_cursor"]
+        requests = {
+            "GET /": "/",
+            "GET /users/1/posts": "/users/1/posts",
+            "GET /api/posts/": "/api/posts/?limit=10",
+            "GET /api/posts/?cursor=": f"/api/posts/?limit=10&cursor={cursor}",
+            "GET /api/users/1/posts": "/api/users/1/posts?limit=10",
+        }
+        for name, url in requests.items():
+            page_cache.invalidate("home", "user:1")
+            statements.clear()
+            response = await client.get(url)
+            response.raise_for_status()
+            print(f"{name:<28} {len(statements)} queries")
+    event.remove(engine.sync_engine, "before_cursor_execute", count)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
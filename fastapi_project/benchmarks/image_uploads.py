@@ -0,0 +1,128 @@
+"""Concurrent profile picture uploads: thread pool versus the image process pool.
+
+While uploads run, a probe task measures event loop lag, which is how long
+every other request on the server would be held up.
+"""
+import asyncio
+import io
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import create_schema, use_scratch_database
+
+use_scratch_database()
+# Every simulated user logs in from the same client address.
+os.environ["AUTH_RATE_LIMIT_IP_BURST"] = "100"
+
+import httpx  # noqa: E402
+from PIL import Image  # noqa: E402
+
+import image_utils  # noqa: E402
+from config import settings  # noqa: E402
+from executor_utils import BoundedExecutor  # noqa: E402
+from main import app  # noqa: E402
+
+USERS = 16
+UPLOADS_PER_USER = 6
+PASSWORD = "BenchmarkPassword1!"
+
+
+def make_photo(seed: int) -> bytes:
+    # Random pixels barely compress, so each upload is a large JPEG to decode.
+    rng = random.Random(seed)
+    img = Image.frombytes("RGB", (1600, 1200), rng.randbytes(1600 * 1200 * 3))
+    output = io.BytesIO()
+    img.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+async def loop_lag(stop: asyncio.Event, samples: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.005)
+        samples.append(time.perf_counter() - started - 0.005)
+
+
+async def run_uploads(client, users, photos) -> tuple[float, int, int, list[float]]:
+    stop = asyncio.Event()
+    lag: list[float] = []
+    probe = asyncio.create_task(loop_lag(stop, lag))
+    statuses: list[int] = []
+
+    async def upload_all(user_id: int, headers: dict, offset: int) -> None:
+        for i in range(UPLOADS_PER_USER):
+            while True:
+                response = await client.patch(
+                    f"/api/users/{user_id}/picture",
+                    files={"file": ("photo.jpg", photos[offset + i], "image/jpeg")},
+                    headers=headers,
+                )
+                statuses.append(response.status_code)
+                if response.status_code != 503:
+                    break
+                await asyncio.sleep(float(response.headers["Retry-After"]) / 10)
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(upload_all(user_id, headers, n * UPLOADS_PER_USER) for n, (user_id, headers) in enumerate(users)),
+    )
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    return elapsed, statuses.count(200), statuses.count(503), lag
+
+
+async def main() -> None:
+    await create_schema()
+    workers = settings.image_process_workers
+    modes = {
+        "thread pool": BoundedExecutor(
+            "image-threads",
+            ThreadPoolExecutor(max_workers=workers),
+            max_workers=workers,
+            max_queue=settings.image_process_max_queue,
+        ),
+        "process pool": image_utils.image_executor,
+    }
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost", timeout=120) as client:
+        users = []
+        for i in range(USERS):
+            response = await client.post(
+                "/api/users",
+                json={"username": f"bench{i}", "email": f"bench{i}@example.com", "password": PASSWORD},
+            )
+            token = (
+                await client.post(
+                    "/api/users/token",
+                    data={"username": f"bench{i}@example.com", "password": PASSWORD},
+                )
+            ).json()["access_token"]
+            users.append((response.json()["id"], {"Authorization": f"Bearer {token}"}))
+
+        uploads = USERS * UPLOADS_PER_USER
+        print(f"{uploads} uploads from {USERS} concurrent clients, {workers} workers, queue {settings.image_process_max_queue}")
+        for seed, (name, executor) in enumerate(modes.items()):
+            # Fresh photos per mode, so content-hash deduplication never skips the work.
+            photos = [make_photo(seed * uploads + i) for i in range(uploads)]
+            image_utils.image_executor = executor
+            image_utils.image_stage_timings = image_utils.StageTimings(image_utils.IMAGE_STAGES)
+            # Warm the pool so process start-up is not timed.
+            await executor.run(image_utils.process_profile_image, photos[0])
+            elapsed, ok, rejected, lag = await run_uploads(client, users, photos)
+            print(
+                f"  {name:>12}: {ok / elapsed:6.1f} uploads/s  {rejected:4} x 503  "
+                f"loop lag p50 {statistics.median(lag) * 1000:6.1f}ms  max {max(lag) * 1000:6.1f}ms",
+            )
+            executor.shutdown()
+
+    print("\nper-stage timings (process pool):")
+    for stage, value in image_utils.image_stage_timings.stats().items():
+        print(f"  {stage:>16}: {value:8.2f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""Both media storage backends under concurrent load, S3 against a local moto server.
+
+Needs moto (pip install "moto[server]"). Reports put throughput, event loop
+lag while the puts run, one multipart upload and a batched delete.
+"""
+import asyncio
+import logging
+import os
+import socket
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks import use_scratch_database
+
+use_scratch_database()
+os.environ.update(AWS_ACCESS_KEY_ID="testing", AWS_SECRET_ACCESS_KEY="testing")
+
+import boto3  # noqa: E402
+from moto.server import ThreadedMotoServer  # noqa: E402
+
+from storage import LocalMediaStorage, S3MediaStorage  # noqa: E402
+
+OBJECTS = 1200
+OBJECT_SIZE = 20 * 1024
+LARGE_OBJECT_SIZE = 20 * 1024 * 1024
+BUCKET = "media-benchmark"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def loop_lag(stop: asyncio.Event, samples: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.005)
+        samples.append(time.perf_counter() - started - 0.005)
+
+
+async def exercise(name: str, storage, count_objects) -> None:
+    keys = [f"profile_pics/object-{i}.webp" for i in range(OBJECTS)]
+    content = os.urandom(OBJECT_SIZE)
+
+    stop = asyncio.Event()
+    lag: list[float] = []
+    probe = asyncio.create_task(loop_lag(stop, lag))
+    started = time.perf_counter()
+    await asyncio.gather(*(storage.put(key, content, "image/webp") for key in keys))
+    put_seconds = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    started = time.perf_counter()
+    await storage.put("exports/large.bin", os.urandom(LARGE_OBJECT_SIZE), "application/octet-stream")
+    large_seconds = time.perf_counter() - started
+
+    stored = count_objects()
+    started = time.perf_counter()
+    await storage.delete_many([*keys, "exports/large.bin"])
+    delete_seconds = time.perf_counter() - started
+
+    print(f"{name}:")
+    print(f"  {OBJECTS} x {OBJECT_SIZE // 1024} KiB puts: {OBJECTS / put_seconds:7.0f} objects/s, "
+          f"loop lag p50 {statistics.median(lag) * 1000:.1f}ms max {max(lag) * 1000:.1f}ms")
+    print(f"  {LARGE_OBJECT_SIZE // (1024 * 1024)} MiB upload:      {large_seconds * 1000:7.0f}ms")
+    print(f"  batched delete:        {delete_seconds * 1000:7.0f}ms, {stored} objects before, {count_objects()} after")
+    await storage.close()
+
+
+async def main() -> None:
+    root = Path(tempfile.mkdtemp(prefix="media_"))
+    await exercise(
+        "local filesystem",
+        LocalMediaStorage(root),
+        lambda: sum(1 for path in root.rglob("*") if path.is_file()),
+    )
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    port = free_port()
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port)
+    server.start()
+    endpoint = f"http://127.0.0.1:{port}"
+    s3 = boto3.client("s3", region_name="us-east-1", endpoint_url=endpoint)
+    s3.create_bucket(Bucket=BUCKET)
+
+    def count_s3_objects() -> int:
+        pages = s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET)
+        return sum(page.get("KeyCount", 0) for page in pages)
+
+    try:
+        await exercise(
+            "S3 (moto)",
+            S3MediaStorage(BUCKET, "us-east-1", endpoint_url=endpoint),
+            count_s3_objects,
+        )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+"""Full-text search latency on a large corpus: FTS5 index versus a LIKE scan.
+
+    python -m benchmarks.search               # one million posts
+    python -m benchmarks.search --posts 100000
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import statistics
+import time
+
+from benchmarks import create_schema, use_scratch_database
+
+use_scratch_database()
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+import models  # noqa: E402
+from database import AsyncSessionLocal, engine  # noqa: E402
+from search_utils import posts_fts, posts_fts_match, search_posts_page  # noqa: E402
+
+VOCABULARY_SIZE = 20_000
+WORDS_PER_POST = 60
+CHUNK_SIZE = 20_000
+ROUNDS = 5
+PAGE_SIZE = 10
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    return parser.parse_args()
+
+
+def make_vocabulary(rng: random.Random) -> list[str]:
+    syllables = ["ka", "lo", "mi", "ren", "tas", "vo", "qui", "del", "spa", "nor", "ex", "bru"]
+    words: set[str] = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choices(syllables, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+async def build_corpus(post_count: int, vocabulary: list[str], rng: random.Random) -> float:
+    # Zipf-like word frequencies, as in natural text: a few very common words
+    # and a long tail of rare ones.
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            insert(models.User),
+            [{"username": "bench", "email": "bench@example.com", "password_hash": "x"}],
+        )
+        for offset in range(0, post_count, CHUNK_SIZE):
+            rows = []
+            for _ in range(min(CHUNK_SIZE, post_count - offset)):
+                words = rng.choices(vocabulary, cum_weights=cum_weights, k=WORDS_PER_POST)
+                rows.append(
+                    {"title": " ".join(words[:6]), "content": " ".join(words[6:]), "user_id": 1},
+                )
+            await db.execute(insert(models.Post), rows)
+            await db.commit()
+    return time.perf_counter() - started
+
+
+async def time_query(run) -> float:
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        await run()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+async def main(args: argparse.Namespace) -> None:
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng)
+    await create_schema()
+    build_seconds = await build_corpus(args.posts, vocabulary, rng)
+    print(f"{args.posts:,} posts inserted and indexed in {build_seconds:.1f}s\n")
+
+    terms = {
+        "common": vocabulary[0],
+        "medium": vocabulary[200],
+        "rare": vocabulary[15_000],
+        "two terms": f"{vocabulary[50]} {vocabulary[500]}",
+    }
+    print(f"{'query':<10} {'matches':>9} {'LIKE scan':>11} {'FTS page 1':>11} {'FTS page 2':>11}")
+    async with AsyncSessionLocal() as db:
+        for name, q in terms.items():
+            matches = (
+                await db.execute(
+                    select(func.count())
+                    .select_from(posts_fts)
+                    .where(posts_fts_match(" ".join(f'"{term}"' for term in q.split()))),
+                )
+            ).scalar()
+            first_page = await search_posts_page(db, q, PAGE_SIZE)
+
+            async def like_scan(word=q.split()[0]):
+                # The naive alternative: substring match, newest first.
+                await db.execute(
+                    select(models.Post)
+                    .where(models.Post.title.contains(word) | models.Post.content.contains(word))
+                    .order_by(models.Post.date_posted.desc())
+                    .limit(PAGE_SIZE),
+                )
+
+            like_ms = await time_query(like_scan)
+            page1_ms = await time_query(lambda q=q: search_posts_page(db, q, PAGE_SIZE))
+            page2_ms = await time_query(
+                lambda q=q, cursor=first_page.next_cursor: search_posts_page(
+                    db, q, PAGE_SIZE, cursor,
+                ),
+            )
+            print(f"{name:<10} {matches:>9,} {like_ms:>9.1f}ms {page1_ms:>9.1f}ms {page2_ms:>9.1f}ms")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,90 @@
+"""Serialization cost of one 100-post feed page, before and after the fast path."""
+import asyncio
+import timeit
+from datetime import UTC, datetime
+
+from benchmarks import use_scratch_database
+
+use_scratch_database()
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+
+import models  # noqa: E402
+from feed_utils import paginated_posts_response  # noqa: E402
+from routers.posts import router  # noqa: E402
+from schemas import PaginatedPostsResponse, PostResponse  # noqa: E402
+
+PAGE_SIZE = 100
+ROUNDS = 200
+
+
+def build_page() -> list[models.Post]:
+    now = datetime.now(UTC)
+    authors = [
+        models.User(
+            id=i,
+            username=f"user{i}",
+            email=f"user{i}@example.com",
+            image_file=None,
+            updated_at=now,
+        )
+        for i in range(10)
+    ]
+    return [
+        models.Post(
+            id=i,
+            title=f"Post {i}",
+            content="Lorem ipsum dolor sit amet. " * 40,
+            user_id=i % 10,
+            date_posted=now,
+            updated_at=now,
+            likes=i,
+            author=authors[i % 10],
+        )
+        for i in range(PAGE_SIZE)
+    ]
+
+
+def page_args() -> dict:
+    return {"total": 10_000, "skip": 0, "limit": PAGE_SIZE, "has_more": True, "next_cursor": "abc"}
+
+
+async def before(posts: list[models.Post], field, dump_json: bool) -> bytes:
+    # What get_posts used to do, followed by FastAPI's response_model handling.
+    page = PaginatedPostsResponse(
+        posts=[PostResponse.model_validate(post) for post in posts],
+        **page_args(),
+    )
+    content = await serialize_response(field=field, response_content=page, dump_json=dump_json)
+    return content if dump_json else JSONResponse(content).body
+
+
+def after(posts: list[models.Post]) -> bytes:
+    return paginated_posts_response(posts, **page_args()).body
+
+
+def main() -> None:
+    posts = build_page()
+    route = next(r for r in router.routes if r.name == "get_posts")
+    field = route.response_field
+    loop = asyncio.new_event_loop()
+
+    assert loop.run_until_complete(before(posts, field, True)) == after(posts)
+
+    timings = {
+        "before (FastAPI dict + json.dumps)": lambda: loop.run_until_complete(before(posts, field, False)),
+        "before (FastAPI dump_json)": lambda: loop.run_until_complete(before(posts, field, True)),
+        "after (TypeAdapter.dump_json)": lambda: after(posts),
+    }
+    print(f"{PAGE_SIZE}-post page, best of 5 x {ROUNDS} rounds")
+    results = {}
+    for name, fn in timings.items():
+        results[name] = min(timeit.repeat(fn, number=ROUNDS, repeat=5)) / ROUNDS
+        print(f"  {name:<36} {results[name] * 1000:7.3f} ms/page")
+    baseline = results["before (FastAPI dump_json)"]
+    print(f"  speedup vs FastAPI dump_json: {baseline / results['after (TypeAdapter.dump_json)']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Serving the built static assets: bytes per first visit and requests/s.
+
+Builds static/dist first. Compares the precompressed siblings with plain
+files and with Starlette's GZipMiddleware compressing on every request.
+"""
+import asyncio
+import time
+from pathlib import Path
+
+from benchmarks import use_scratch_database
+
+use_scratch_database()
+
+import httpx  # noqa: E402
+from starlette.applications import Starlette  # noqa: E402
+from starlette.middleware.gzip import GZipMiddleware  # noqa: E402
+from starlette.routing import Mount  # noqa: E402
+from starlette.staticfiles import StaticFiles  # noqa: E402
+
+import static_assets  # noqa: E402
+from config import settings  # noqa: E402
+
+REQUESTS = 2000
+# What layout.html links, plus the two modules every page imports.
+PAGE_ASSETS = ["css/main.css", "icons/favicon.ico", "icons/icon.svg", "js/utils.js", "js/auth.js"]
+
+
+async def fetch_all(app, paths: list[str], accept_encoding: str) -> tuple[float, int]:
+    transport = httpx.ASGITransport(app=app)
+    total_bytes = 0
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+        started = time.perf_counter()
+        for i in range(REQUESTS):
+            response = await client.get(paths[i % len(paths)], headers={"Accept-Encoding": accept_encoding})
+            if i < len(paths):
+                total_bytes += response.num_bytes_downloaded
+        elapsed = time.perf_counter() - started
+    return REQUESTS / elapsed, total_bytes
+
+
+async def main() -> None:
+    static_dir = Path(settings.static_dir)
+    static_assets.build_assets(static_dir)
+    static_assets.asset_manifest = static_assets.load_manifest(static_dir)
+    built = [static_assets.asset_url(path) for path in PAGE_ASSETS]
+    plain = [f"/static/{path}" for path in PAGE_ASSETS]
+
+    modes = {
+        "plain files": (Starlette(routes=[Mount("/static", StaticFiles(directory=static_dir))]), plain, "identity"),
+        "gzip per request": (
+            GZipMiddleware(Starlette(routes=[Mount("/static", StaticFiles(directory=static_dir))])),
+            plain,
+            "gzip",
+        ),
+        "precompressed gzip": (
+            Starlette(routes=[Mount("/static", static_assets.static_files())]),
+            built,
+            "gzip",
+        ),
+        "precompressed br": (
+            Starlette(routes=[Mount("/static", static_assets.static_files())]),
+            built,
+            "br",
+        ),
+    }
+    print(f"{len(PAGE_ASSETS)} page assets, {REQUESTS} requests per mode")
+    for name, (app, paths, accept_encoding) in modes.items():
+        rate, first_visit = await fetch_all(app, paths, accept_encoding)
+        print(f"  {name:>18}: {first_visit / 1024:6.1f} KiB first visit  {rate:7.0f} req/s")
+    print("  repeat visits revalidate 0 fingerprinted assets (Cache-Control: immutable)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -7,26 +7,86 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     app_name: str = "FastAPI Blog"
     debug: bool = False
+    # /internal/* exposes pool, cache and limiter state; keep it off on public servers.
+    internal_endpoints_enabled: bool = False
+    internal_api_token: SecretStr | None = None
     static_dir: str = "static"
     templates_dir: str = "templates"
     default_post_date: str = "April 23, 2025"
     secret_key:SecretStr
     algorithm:str = "HS256"
     access_token_expire_minutes: int=30
+    auth_cache_ttl_seconds: int = 60
+    auth_cache_max_entries: int = 10_000
+    # Auth routes release their database connection before queueing for a
+    # hash, so workers + queue may exceed db_pool_size + db_max_overflow.
+    password_hash_workers: int = 4
+    password_hash_max_queue: int = 64
+    auth_rate_limit_ip_burst: int = 30
+    auth_rate_limit_ip_per_minute: float = 30.0
+    auth_rate_limit_account_burst: int = 10
+    auth_rate_limit_account_per_minute: float = 10.0
+    auth_rate_limit_max_keys: int = 50_000
+    auth_rate_limit_shards: int = 16
     s3_bucket_name: str | None = None
     s3_region: str = "us-east-1"
+    s3_endpoint_url: str | None = None
+    s3_public_url: str | None = None
+    s3_max_concurrency: int = 10
     max_upload_size_bytes: int = 5 * 1024 * 1024
+    image_process_workers: int = 2
+    image_process_max_queue: int = 8
+    # Decoded size cap; a small file can still expand to gigabytes of pixels.
+    image_max_pixels: int = 40_000_000
     posts_per_page:int = 10
+    page_cache_max_bytes: int = 16 * 1024 * 1024
+    page_cache_ttl_seconds: int = 30
+    compression_min_size: int = 1024
+    compression_streaming: bool = False
+    # Larger bodies are compressed in the thread pool instead of on the event loop.
+    compression_thread_min_size: int = 64 * 1024
+    # Per media type and encoding (gzip 1-9, br 0-9, zstd 1-19; higher values are
+    # capped); unlisted types go out as is.
+    compression_levels: dict[str, dict[str, int]] = {
+        "application/json": {"zstd": 3, "br": 5, "gzip": 6},
+        "text/html": {"zstd": 3, "br": 5, "gzip": 6},
+        "application/x-ndjson": {"zstd": 3, "br": 5, "gzip": 6},
+        "text/csv": {"zstd": 3, "br": 5, "gzip": 6},
+        "text/css": {"zstd": 9, "br": 8, "gzip": 9},
+        "text/javascript": {"zstd": 9, "br": 8, "gzip": 9},
+        "image/svg+xml": {"zstd": 9, "br": 8, "gzip": 9},
+    }
+    likes_flush_interval_seconds: float = 2.0
+    likes_flush_threshold: int = 1000
+    export_chunk_size: int = 500
     reset_token_expire_minutes: int = 60
+    reset_token_sweep_interval_seconds: float = 300.0
+    reset_token_sweep_batch_size: int = 500
+    reset_token_sweep_pause_seconds: float = 0.05
     mail_server: str = "localhost"
     mail_port: int = 587
     mail_username: str = ""
     mail_password: SecretStr = SecretStr("")
     mail_from: str = "noreply@example.com"
     mail_use_tls: bool = True
+    mail_pool_size: int = 2
+    mail_outbox_batch_size: int = 50
+    mail_outbox_poll_seconds: float = 5.0
+    mail_outbox_lease_seconds: int = 120
+    mail_max_attempts: int = 8
+    mail_retry_base_seconds: float = 30.0
+    mail_retry_max_seconds: float = 3600.0
     frontend_url: str = "http://localhost:8000"
 
     database_url: str
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_pool_log_interval_seconds: float = 60.0
+    read_database_url: str | None = None
+    read_your_writes_seconds: int = 5
     
     @field_validator("debug", mode="before")
     @classmethod
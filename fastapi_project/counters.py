@@ -0,0 +1,85 @@
+import asyncio
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from database import AsyncSessionLocal, engine
+
+# Primary key of the single models.PostStats row.
+GLOBAL_STATS_ID = 1
+
+
+async def adjust_post_counts(db: AsyncSession, user_id: int, delta: int) -> None:
+    """Add delta to the global and per-user post counters.
+
+    Uses atomic UPDATE ... SET x = x + delta statements so concurrent writers
+    never lose an increment. Call it before db.commit() so the counters change
+    in the same transaction as the posts themselves.
+    """
+    await db.execute(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(post_count=models.User.post_count + delta),
+    )
+    await adjust_global_post_count(db, delta)
+
+
+async def adjust_global_post_count(db: AsyncSession, delta: int) -> None:
+    result = await db.execute(
+        update(models.PostStats)
+        .where(models.PostStats.id == GLOBAL_STATS_ID)
+        .values(post_count=models.PostStats.post_count + delta),
+    )
+    if result.rowcount == 0:
+        # Stats row missing (fresh database created without migrations).
+        await reconcile_post_counts(db)
+
+
+async def get_total_posts(db: AsyncSession) -> int:
+    result = await db.execute(
+        select(models.PostStats.post_count).where(
+            models.PostStats.id == GLOBAL_STATS_ID,
+        ),
+    )
+    return result.scalar() or 0
+
+
+async def reconcile_post_counts(db: AsyncSession) -> None:
+    """Recompute post counts and like counts from scratch (does not commit)."""
+    per_user = (
+        select(func.count())
+        .select_from(models.Post)
+        .where(models.Post.user_id == models.User.id)
+        .scalar_subquery()
+    )
+    await db.execute(update(models.User).values(post_count=per_user))
+
+    likes = (
+        select(func.count())
+        .select_from(models.PostLike)
+        .where(models.PostLike.post_id == models.Post.id)
+        .scalar_subquery()
+    )
+    await db.execute(update(models.Post).values(likes=likes))
+
+    total = (await db.execute(select(func.count()).select_from(models.Post))).scalar() or 0
+    stats = await db.get(models.PostStats, GLOBAL_STATS_ID)
+    if stats is None:
+        db.add(models.PostStats(id=GLOBAL_STATS_ID, post_count=total))
+    else:
+        stats.post_count = total
+    await db.flush()
+
+
+async def main() -> None:
+    async with AsyncSessionLocal() as db:
+        await reconcile_post_counts(db)
+        await db.commit()
+        total = await get_total_posts(db)
+    await engine.dispose()
+    print(f"Reconciled post counters: {total} posts")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
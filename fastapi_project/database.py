@@ -1,10 +1,25 @@
+import time
+
+from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 from config import settings
+from pool_stats import MonitoredQueuePool, pool_monitor
+
+POOL_OPTIONS = {
+    "pool_size": settings.db_pool_size,
+    "max_overflow": settings.db_max_overflow,
+    "pool_timeout": settings.db_pool_timeout,
+    "pool_recycle": settings.db_pool_recycle,
+    "pool_pre_ping": settings.db_pool_pre_ping,
+}
 
 engine = create_async_engine(
-    settings.database_url
+    settings.database_url,
+    poolclass=MonitoredQueuePool,
+    **POOL_OPTIONS,
 )
+pool_monitor.attach(engine.sync_engine, "primary")
 # Create a configured "Session" class, each session is each transaction
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -12,6 +27,28 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False, 
 )
 
+# Optional read replica for read-only routes; without one, reads use the primary.
+if settings.read_database_url:
+    read_engine = create_async_engine(
+        settings.read_database_url,
+        poolclass=MonitoredQueuePool,
+        **POOL_OPTIONS,
+    )
+    pool_monitor.attach(read_engine.sync_engine, "replica")
+    ReadSessionLocal = async_sessionmaker(
+        read_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+else:
+    read_engine = engine
+    ReadSessionLocal = AsyncSessionLocal
+
+# Set by middleware.ReadYourWritesMiddleware after a successful write. Until it
+# expires that client's reads go to the primary, so replica lag never hides
+# their own changes from them.
+READ_PRIMARY_COOKIE = "read_primary_until"
+
 #it gives SQLAlchemy a place to collect all your table/model definitions.
 class Base(DeclarativeBase):
     pass
@@ -19,5 +56,19 @@ class Base(DeclarativeBase):
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
-        
-        
+
+
+def reads_from_primary(request: Request) -> bool:
+    if read_engine is engine:
+        return True
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+async def get_read_db(request: Request):
+    """Session for read-only routes: the replica, or the primary right after a write."""
+    session_factory = AsyncSessionLocal if reads_from_primary(request) else ReadSessionLocal
+    async with session_factory() as session:
+        yield session
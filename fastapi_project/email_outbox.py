@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import random
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import delete, select, update
+
+import models
+from config import settings
+from database import AsyncSessionLocal, engine
+from email_utils import SMTPConnectionPool, build_message, smtp_pool
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for a message that has failed `attempts` times."""
+    delay = min(
+        settings.mail_retry_max_seconds,
+        settings.mail_retry_base_seconds * 2 ** (attempts - 1),
+    )
+    # Jitter spreads out retries of messages that failed together, e.g. during
+    # an SMTP outage, so they do not all hit the server again at once.
+    return delay * random.uniform(0.5, 1.0)
+
+
+class EmailOutboxWorker:
+    """Drains models.EmailOutbox in batches over a shared SMTPConnectionPool.
+
+    Each batch is claimed by pushing next_attempt_at forward by a lease, so a
+    message whose sender crashes mid-send is picked up again once the lease
+    runs out, and on PostgreSQL concurrent workers skip each other's rows.
+    The worker polls every poll_interval seconds and wakes immediately when
+    wake() is called after a commit that queued mail. Messages past their
+    expires_at are deleted instead of sent, and a parked message keeps its
+    headers and last_error but not its body.
+    """
+
+    def __init__(
+        self,
+        pool: SMTPConnectionPool,
+        batch_size: int,
+        poll_interval: float,
+        lease_seconds: int,
+        max_attempts: int,
+    ) -> None:
+        self.pool = pool
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._wake = asyncio.Event()
+        self._drain_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self.batches = 0
+        self.sent = 0
+        self.retried = 0
+        self.abandoned = 0
+        self.expired = 0
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    async def _claim_batch(self) -> list[models.EmailOutbox]:
+        now = datetime.now(UTC)
+        async with AsyncSessionLocal() as db:
+            # A reset link past its token's expiry is useless, so drop it unsent.
+            expired = await db.execute(
+                delete(models.EmailOutbox).where(models.EmailOutbox.expires_at <= now),
+            )
+            self.expired += expired.rowcount
+            messages = (
+                await db.scalars(
+                    select(models.EmailOutbox)
+                    .where(models.EmailOutbox.next_attempt_at <= now)
+                    .order_by(models.EmailOutbox.next_attempt_at)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True),
+                )
+            ).all()
+            lease_until = now + timedelta(seconds=self.lease_seconds)
+            for message in messages:
+                message.next_attempt_at = lease_until
+            await db.commit()
+        return list(messages)
+
+    async def _send(self, message: models.EmailOutbox) -> None:
+        await self.pool.send(
+            build_message(
+                message.to_email,
+                message.subject,
+                message.plain_text,
+                message.html_content,
+            ),
+        )
+
+    async def _record_results(
+        self,
+        messages: list[models.EmailOutbox],
+        results: list[BaseException | None],
+    ) -> None:
+        now = datetime.now(UTC)
+        sent_ids = [message.id for message, error in zip(messages, results) if error is None]
+        async with AsyncSessionLocal() as db:
+            if sent_ids:
+                await db.execute(
+                    delete(models.EmailOutbox).where(models.EmailOutbox.id.in_(sent_ids)),
+                )
+            for message, error in zip(messages, results):
+                if error is None:
+                    continue
+                attempts = message.attempts + 1
+                if attempts >= self.max_attempts:
+                    # Out of attempts: park the row, keeping last_error for
+                    # inspection but not the body, which may hold a reset link.
+                    values = {"next_attempt_at": None, "plain_text": "", "html_content": None}
+                    self.abandoned += 1
+                    logger.error("Giving up on email %s to %s: %r", message.id, message.to_email, error)
+                else:
+                    values = {"next_attempt_at": now + timedelta(seconds=retry_delay(attempts))}
+                    self.retried += 1
+                await db.execute(
+                    update(models.EmailOutbox)
+                    .where(models.EmailOutbox.id == message.id)
+                    .values(attempts=attempts, last_error=repr(error), **values),
+                )
+            await db.commit()
+        self.sent += len(sent_ids)
+
+    async def drain(self) -> int:
+        """Send every due message, batch by batch; returns how many were sent."""
+        async with self._drain_lock:
+            sent_before = self.sent
+            while True:
+                messages = await self._claim_batch()
+                if not messages:
+                    break
+                results = await asyncio.gather(
+                    *(self._send(message) for message in messages),
+                    return_exceptions=True,
+                )
+                await self._record_results(messages, results)
+                self.batches += 1
+                if len(messages) < self.batch_size:
+                    break
+            return self.sent - sent_before
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.drain()
+            except Exception:
+                logger.exception("Failed to drain the email outbox")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # Unsent mail stays in the outbox for the next process to pick up.
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.pool.close()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "batches": self.batches,
+            "sent": self.sent,
+            "retried": self.retried,
+            "abandoned": self.abandoned,
+            "expired": self.expired,
+            **{f"smtp_{key}": value for key, value in self.pool.stats().items()},
+        }
+
+
+email_outbox = EmailOutboxWorker(
+    smtp_pool,
+    batch_size=settings.mail_outbox_batch_size,
+    poll_interval=settings.mail_outbox_poll_seconds,
+    lease_seconds=settings.mail_outbox_lease_seconds,
+    max_attempts=settings.mail_max_attempts,
+)
+
+
+async def main() -> None:
+    sent = await email_outbox.drain()
+    await email_outbox.pool.close()
+    await engine.dispose()
+    print(f"Sent {sent} queued emails")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,35 +1,145 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
 from email.message import EmailMessage
+
 import aiosmtplib
 from fastapi.templating import Jinja2Templates
+from sqlalchemy.ext.asyncio import AsyncSession
 
+import models
 from config import settings
 
 templates = Jinja2Templates(directory="templates")
 
-async def send_email(
-    to_email:str,
-    subject:str,
-    plain_text:str,
-    htmal_content:str | None = None,
-)->None:
+
+def build_message(
+    to_email: str,
+    subject: str,
+    plain_text: str,
+    html_content: str | None = None,
+) -> EmailMessage:
     message = EmailMessage()
     message["From"] = settings.mail_from
     message["To"] = to_email
     message["Subject"] = subject
     message.set_content(plain_text)
-    
-    if htmal_content:
-        message.add_alternative(htmal_content, subtype="html")
-    
-    await aiosmtplib.send(
-        message,
-        hostname=settings.mail_server,
-        port=settings.mail_port,
-        username=settings.mail_username if settings.mail_username else None,
-        password=settings.mail_password.get_secret_value() or None,
-        start_tls=settings.mail_use_tls,
+
+    if html_content:
+        message.add_alternative(html_content, subtype="html")
+    return message
+
+
+class SMTPConnectionPool:
+    """A fixed set of persistent SMTP connections shared by concurrent senders.
+
+    Connections are opened lazily, kept open between messages and replaced
+    after any error, so a burst of mail reuses a few sessions instead of
+    opening one connection (and TLS handshake and login) per message.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._idle: asyncio.Queue[aiosmtplib.SMTP] | None = None
+        self.connections_opened = 0
+        self.messages_sent = 0
+        self.send_errors = 0
+
+    def _new_client(self) -> aiosmtplib.SMTP:
+        return aiosmtplib.SMTP(
+            hostname=settings.mail_server,
+            port=settings.mail_port,
+            username=settings.mail_username or None,
+            password=settings.mail_password.get_secret_value() or None,
+            start_tls=settings.mail_use_tls,
+        )
+
+    @asynccontextmanager
+    async def connection(self):
+        if self._idle is None:
+            # Created on first use so the queue binds to the running event loop.
+            self._idle = asyncio.Queue()
+            for _ in range(self.size):
+                self._idle.put_nowait(self._new_client())
+
+        client = await self._idle.get()
+        try:
+            if not client.is_connected:
+                await client.connect()
+                self.connections_opened += 1
+            yield client
+        except BaseException:
+            # The session state is unknown after a failure; start the next
+            # sender on a fresh connection.
+            client.close()
+            client = self._new_client()
+            raise
+        finally:
+            self._idle.put_nowait(client)
+
+    async def send(self, message: EmailMessage) -> None:
+        try:
+            async with self.connection() as client:
+                await client.send_message(message)
+        except Exception:
+            self.send_errors += 1
+            raise
+        self.messages_sent += 1
+
+    async def close(self) -> None:
+        if self._idle is None:
+            return
+        while not self._idle.empty():
+            client = self._idle.get_nowait()
+            if client.is_connected:
+                try:
+                    await client.quit()
+                except aiosmtplib.SMTPException:
+                    client.close()
+        self._idle = None
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": self.size,
+            "connections_opened": self.connections_opened,
+            "messages_sent": self.messages_sent,
+            "send_errors": self.send_errors,
+        }
+
+
+smtp_pool = SMTPConnectionPool(settings.mail_pool_size)
+
+
+def queue_email(
+    db: AsyncSession,
+    to_email: str,
+    subject: str,
+    plain_text: str,
+    html_content: str | None = None,
+    expires_at: datetime | None = None,
+) -> models.EmailOutbox:
+    """Add a message to the outbox; it is sent once the caller's transaction commits.
+
+    A message with expires_at is dropped unsent once that time passes.
+    """
+    outbox_message = models.EmailOutbox(
+        to_email=to_email,
+        subject=subject,
+        plain_text=plain_text,
+        html_content=html_content,
+        expires_at=expires_at,
     )
-async def send_password_reset_email(to_email: str, username: str, token: str) -> None:
+    db.add(outbox_message)
+    return outbox_message
+
+
+def queue_password_reset_email(
+    db: AsyncSession,
+    to_email: str,
+    username: str,
+    token: str,
+    expires_at: datetime,
+) -> models.EmailOutbox:
     reset_url = f"{settings.frontend_url}/reset-password?token={token}"
 
     template = templates.env.get_template("email/password_reset.html")
@@ -49,9 +159,12 @@ Best regards,
 The FastAPI Blog Team
 """
 
-    await send_email(
+    return queue_email(
+        db,
         to_email=to_email,
         subject="Reset Your Password - FastAPI Blog",
         plain_text=plain_text,
         html_content=html_content,
-    )
\ No newline at end of file
+        # The body holds the raw token, so it must not outlive the token.
+        expires_at=expires_at,
+    )
@@ -0,0 +1,60 @@
+import hashlib
+from datetime import UTC, datetime
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response, status
+
+import models
+
+
+def make_etag(*parts: object) -> str:
+    """Build a weak ETag from values that change whenever the response body would."""
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def post_version(post: models.Post) -> tuple:
+    # A post's JSON embeds its author, so the author's version is part of it.
+    return (post.id, post.updated_at, post.author.updated_at)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything is stored in UTC.
+    return value.replace(tzinfo=UTC) if value.tzinfo is None else value.astimezone(UTC)
+
+
+def validator_headers(etag: str, last_modified: datetime | None = None) -> dict[str, str]:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    return headers
+
+
+def not_modified_response(
+    request: Request,
+    etag: str,
+    last_modified: datetime | None = None,
+) -> Response | None:
+    """Return a 304 response if the client's cached copy is still current.
+
+    If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2).
+    """
+    headers = validator_headers(etag, last_modified)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in candidates or etag.removeprefix("W/") in candidates:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        # HTTP dates have one-second resolution.
+        if _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
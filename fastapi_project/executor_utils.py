@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from concurrent.futures import BrokenExecutor, Executor
+from typing import Any
+
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+
+def _timed_call(fn: Callable[..., Any], *args: Any) -> tuple[Any, float, float]:
+    # Module-level so it can be pickled when the executor is a process pool.
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, started, time.perf_counter()
+
+
+class BoundedExecutor:
+    """Runs blocking work off the event loop with a cap on queued submissions.
+
+    At most max_workers calls run at once; up to max_queue more may wait for a
+    worker. Anything beyond that is rejected straight away with a 503 carrying
+    Retry-After, instead of piling up behind a saturated pool.
+
+    A process pool whose worker dies, e.g. killed for running out of memory,
+    rejects everything after it. Given executor_factory, the broken pool is
+    swapped for a fresh one and the calls that hit it get the same 503.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        executor: Executor,
+        max_workers: int,
+        max_queue: int,
+        retry_after_seconds: int = 1,
+        executor_factory: Callable[[], Executor] | None = None,
+    ) -> None:
+        self.name = name
+        self._executor = executor
+        self._executor_factory = executor_factory
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after_seconds = retry_after_seconds
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.run_time_total = 0.0
+        self.run_time_max = 0.0
+
+    def _busy(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy. Please try again shortly.",
+            headers={"Retry-After": str(self.retry_after_seconds)},
+        )
+
+    def _replace_broken(self, executor: Executor) -> None:
+        # Every call that was queued on the broken pool fails together; only
+        # the first replaces it.
+        if self._executor_factory is None or self._executor is not executor:
+            return
+        logger.error("%s pool is broken; starting a new one", self.name)
+        self._executor = self._executor_factory()
+        self.restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._in_flight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise self._busy()
+
+        self._in_flight += 1
+        submitted = time.perf_counter()
+        executor = self._executor
+        try:
+            loop = asyncio.get_running_loop()
+            result, started, finished = await loop.run_in_executor(
+                executor,
+                _timed_call,
+                fn,
+                *args,
+            )
+        except BrokenExecutor as err:
+            self._replace_broken(executor)
+            raise self._busy() from err
+        finally:
+            self._in_flight -= 1
+
+        queue_wait = max(started - submitted, 0.0)
+        run_time = finished - started
+        self.completed += 1
+        self.queue_wait_total += queue_wait
+        self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+        self.run_time_total += run_time
+        self.run_time_max = max(self.run_time_max, run_time)
+        return result
+
+    def stats(self) -> dict[str, int | float]:
+        completed = self.completed or 1
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+            "queue_wait_avg_ms": round(self.queue_wait_total / completed * 1000, 3),
+            "queue_wait_max_ms": round(self.queue_wait_max * 1000, 3),
+            "run_time_avg_ms": round(self.run_time_total / completed * 1000, 3),
+            "run_time_max_ms": round(self.run_time_max * 1000, 3),
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,255 @@
+"""Query-plan regression check.
+
+Seeds a scratch database, drives every route in main.py and routers/ through the
+ASGI app, captures the SELECT statements they issue and runs EXPLAIN on each one.
+Exits non-zero if any plan falls back to a full table scan or a sort step.
+Full-text search is the one exception to the sort rule: ranking by relevance
+has to sort the matches by score, so only scans are checked there.
+
+    python explain_queries.py                       # temporary SQLite file
+    python explain_queries.py --database-url URL    # an EMPTY scratch database
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+from datetime import UTC, datetime, timedelta
+
+SEED_USERS = 50
+SEED_POSTS = 5000
+SEED_PASSWORD = "ExplainPassword1!"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--database-url",
+        help="Async SQLAlchemy URL of an empty scratch database (default: temporary SQLite file)",
+    )
+    return parser.parse_args()
+
+
+# An FTS5 virtual table scan whose index string includes M is driven by MATCH.
+FTS_MATCH_SCAN = re.compile(r"VIRTUAL TABLE INDEX \d+:\S*M")
+RELEVANCE_RANKED = ("MATCH", "ts_rank_cd(")
+
+
+def sqlite_plan_problems(rows: list) -> list[str]:
+    problems = []
+    # Scanning a materialized subquery reads only the rows it already limited.
+    materialized = {
+        row[-1].removeprefix("MATERIALIZE ") for row in rows if row[-1].startswith("MATERIALIZE ")
+    }
+    for row in rows:
+        detail = row[-1]
+        if detail.startswith("SCAN ") and "USING" not in detail:
+            if FTS_MATCH_SCAN.search(detail) or detail.removeprefix("SCAN ") in materialized:
+                continue
+            problems.append(f"full scan: {detail}")
+        elif detail.startswith("USE TEMP B-TREE"):
+            problems.append(f"filesort: {detail}")
+    return problems
+
+
+def postgres_plan_problems(plan: dict) -> list[str]:
+    problems = []
+    node_type = plan.get("Node Type", "")
+    if node_type == "Seq Scan":
+        problems.append(f"full scan: Seq Scan on {plan.get('Relation Name')}")
+    elif node_type in {"Sort", "Incremental Sort"}:
+        problems.append(f"filesort: {node_type} on {plan.get('Sort Key')}")
+    for child in plan.get("Plans", []):
+        problems.extend(postgres_plan_problems(child))
+    return problems
+
+
+async def seed(engine, models) -> None:
+    from sqlalchemy import insert
+
+    from auth import hash_password
+    from counters import reconcile_post_counts
+    from database import AsyncSessionLocal, Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    password_hash = hash_password(SEED_PASSWORD)
+    now = datetime.now(UTC)
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            insert(models.User),
+            [
+                {
+                    "username": f"explain_user_{i}",
+                    "email": f"explain_user_{i}@example.com",
+                    "password_hash": password_hash,
+                }
+                for i in range(1, SEED_USERS + 1)
+            ],
+        )
+        await db.execute(
+            insert(models.Post),
+            [
+                {
+                    "title": f"Post {i}",
+                    "content": "Seeded content for query plan checks.",
+                    "user_id": i % SEED_USERS + 1,
+                    "date_posted": now - timedelta(minutes=i),
+                }
+                for i in range(SEED_POSTS)
+            ],
+        )
+        await reconcile_post_counts(db)
+        await db.commit()
+
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("ANALYZE")
+
+
+async def exercise_routes(app) -> None:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+
+        async def call(method: str, url: str, **kwargs) -> httpx.Response:
+            response = await client.request(method, url, **kwargs)
+            if response.status_code >= 500:
+                raise RuntimeError(f"{method} {url} returned {response.status_code}")
+            return response
+
+        # Anonymous HTML pages and read APIs.
+        await call("GET", "/")
+        await call("GET", "/posts/1")
+        await call("GET", "/users/1/posts")
+        page = (await call("GET", "/api/posts/?limit=10")).json()
+        await call("GET", "/api/posts/", params={"limit": 10, "cursor": page["next_cursor"]})
+        await call("GET", "/api/posts/1")
+        await call("GET", "/api/users/1")
+        page = (await call("GET", "/api/users/1/posts?limit=10")).json()
+        await call("GET", "/api/users/1/posts", params={"limit": 10, "cursor": page["next_cursor"]})
+        page = (await call("GET", "/api/posts/search", params={"q": "seeded plan", "limit": 10})).json()
+        await call("GET", "/api/posts/search", params={"q": "seeded plan", "limit": 10, "cursor": page["next_cursor"]})
+
+        # Account and auth flows.
+        await call(
+            "POST",
+            "/api/users",
+            json={
+                "username": "explain_new_user",
+                "email": "explain_new_user@example.com",
+                "password": SEED_PASSWORD,
+            },
+        )
+        token = (
+            await call(
+                "POST",
+                "/api/users/token",
+                data={"username": "explain_new_user@example.com", "password": SEED_PASSWORD},
+            )
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        me = (await call("GET", "/api/users/me", headers=headers)).json()
+        await call("POST", "/api/users/forgot-password", json={"email": "nobody@example.com"})
+        await call("POST", "/api/users/reset-password", json={"token": "x", "new_password": "NewPassword1!"})
+        await call(
+            "PATCH",
+            "/api/users/me/password",
+            json={"current_password": SEED_PASSWORD, "new_password": SEED_PASSWORD},
+            headers=headers,
+        )
+        await call(
+            "PATCH",
+            f"/api/users/{me['id']}",
+            json={"username": "explain_renamed", "email": "explain_renamed@example.com"},
+            headers=headers,
+        )
+
+        # Post writes.
+        post = (
+            await call("POST", "/api/posts/", json={"title": "t", "content": "c"}, headers=headers)
+        ).json()
+        await call("PATCH", f"/api/posts/{post['id']}", json={"title": "t2"}, headers=headers)
+        await call("POST", "/api/posts/1/like", headers=headers)
+        await call("DELETE", "/api/posts/1/like", headers=headers)
+        await call("DELETE", f"/api/posts/{post['id']}", headers=headers)
+        await call("DELETE", f"/api/users/{me['id']}", headers=headers)
+
+
+async def explain(engine, statements: list[tuple[str, object]]) -> int:
+    failures = 0
+    seen: set[str] = set()
+    async with engine.connect() as conn:
+        is_postgres = conn.dialect.name == "postgresql"
+        if is_postgres:
+            # Small seeded tables make sequential scans look cheap; disabling them
+            # means a Seq Scan in the plan only appears when no index can be used.
+            await conn.exec_driver_sql("SET enable_seqscan = off")
+            await conn.exec_driver_sql("SET enable_sort = off")
+
+        for statement, parameters in statements:
+            if statement in seen:
+                continue
+            seen.add(statement)
+
+            if is_postgres:
+                result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+                plan = result.scalar()
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+                problems = postgres_plan_problems(plan[0]["Plan"])
+            else:
+                result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                problems = sqlite_plan_problems(result.all())
+
+            if any(marker in statement for marker in RELEVANCE_RANKED):
+                problems = [problem for problem in problems if not problem.startswith("filesort")]
+
+            status = "FAIL" if problems else "ok"
+            print(f"[{status}] {' '.join(statement.split())[:160]}")
+            for problem in problems:
+                print(f"       {problem}")
+            failures += bool(problems)
+    return failures
+
+
+async def main(args: argparse.Namespace) -> int:
+    from sqlalchemy import event
+
+    import models
+    from database import engine
+    from main import app
+
+    await seed(engine, models)
+
+    statements: list[tuple[str, object]] = []
+
+    def capture(_conn, _cursor, statement, parameters, _context, _executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        await exercise_routes(app)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    failures = await explain(engine, statements)
+    await engine.dispose()
+
+    print(f"\n{len({s for s, _ in statements})} distinct queries, {failures} with bad plans")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # database.py builds its engine from settings at import time, so the target
+    # database has to be chosen before any application module is imported.
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        scratch_dir = tempfile.mkdtemp(prefix="explain_queries_")
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{scratch_dir}/explain.db"
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,217 @@
+import base64
+import json
+from collections.abc import Sequence
+from datetime import datetime
+from typing import NamedTuple
+
+from fastapi import HTTPException, Response, status
+from pydantic import TypeAdapter
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+
+import models
+from counters import GLOBAL_STATS_ID, get_total_posts
+from schemas import PaginatedPostsResponse
+
+# Feeds are ordered newest first; id breaks ties between posts with the same timestamp
+# so that every row has a unique, stable position for keyset pagination.
+FEED_ORDER = (models.Post.date_posted.desc(), models.Post.id.desc())
+
+
+def encode_position(*values: object) -> str:
+    """Encode a JSON-serializable sort position as an opaque cursor."""
+    payload = json.dumps(values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_position(cursor: str) -> list:
+    """Decode a cursor produced by encode_position, raising 400 if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except ValueError as err:
+        raise _invalid_cursor() from err
+    if not isinstance(values, list):
+        raise _invalid_cursor()
+    return values
+
+
+def _invalid_cursor() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid pagination cursor",
+    )
+
+
+def encode_cursor(post: models.Post) -> str:
+    """Encode the (date_posted, id) position of a post as an opaque cursor."""
+    return encode_position(post.date_posted.isoformat(), post.id)
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor, raising 400 if it is malformed."""
+    try:
+        date_posted, post_id = decode_position(cursor)
+        return datetime.fromisoformat(date_posted), int(post_id)
+    except (ValueError, TypeError) as err:
+        raise _invalid_cursor() from err
+
+
+def paginate_feed(
+    query: Select,
+    limit: int,
+    cursor: str | None = None,
+    skip: int = 0,
+) -> Select:
+    """Apply feed ordering and a page window to a select(models.Post) query.
+
+    With a cursor the page starts right after the cursor position using an
+    indexed range condition, so the cost does not grow with page depth.
+    Without one the legacy skip offset is used. One extra row is fetched so
+    split_feed_page can tell whether another page exists.
+    """
+    if cursor is not None:
+        date_posted, post_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(models.Post.date_posted, models.Post.id) < (date_posted, post_id),
+        )
+    elif skip:
+        query = query.offset(skip)
+    return query.order_by(*FEED_ORDER).limit(limit + 1)
+
+
+def split_feed_page(
+    posts: Sequence[models.Post],
+    limit: int,
+) -> tuple[list[models.Post], bool, str | None]:
+    """Trim the look-ahead row and return (page, has_more, next_cursor)."""
+    page = list(posts[:limit])
+    has_more = len(posts) > limit
+    next_cursor = encode_cursor(page[-1]) if has_more and page else None
+    return page, has_more, next_cursor
+
+
+class FeedPage(NamedTuple):
+    posts: list[models.Post]
+    total: int
+    has_more: bool
+    next_cursor: str | None
+
+
+def feed_query(limit: int, cursor: str | None = None, skip: int = 0) -> Select:
+    """Select a page of the global feed with its authors and the total in one statement.
+
+    Each row is (Post, total). The total comes from the maintained post_stats
+    counter as a scalar subquery rather than count(*) OVER (), which would have
+    to visit every post on every page.
+    """
+    total = (
+        select(models.PostStats.post_count)
+        .where(models.PostStats.id == GLOBAL_STATS_ID)
+        .scalar_subquery()
+    )
+    query = (
+        select(models.Post, total.label("total"))
+        .join(models.Post.author)
+        .options(contains_eager(models.Post.author))
+    )
+    return paginate_feed(query, limit, cursor=cursor, skip=skip)
+
+
+def user_feed_query(
+    user_id: int,
+    limit: int,
+    cursor: str | None = None,
+    skip: int = 0,
+) -> Select:
+    """Select a user and a page of their posts in one statement.
+
+    Each row is (User, Post). The outer join keeps the user row, with Post set
+    to None, when they have no posts, so the user's existence, their
+    post_count (the total) and the page all arrive together.
+    """
+    query = (
+        select(models.User, models.Post)
+        .outerjoin(models.Post, models.Post.user_id == models.User.id)
+        .where(models.User.id == user_id)
+        .options(contains_eager(models.Post.author))
+    )
+    return paginate_feed(query, limit, cursor=cursor, skip=skip)
+
+
+async def fetch_feed(
+    db: AsyncSession,
+    limit: int,
+    cursor: str | None = None,
+    skip: int = 0,
+) -> FeedPage:
+    rows = (await db.execute(feed_query(limit, cursor=cursor, skip=skip))).all()
+    posts, has_more, next_cursor = split_feed_page([post for post, _ in rows], limit)
+    if rows:
+        total = rows[0].total or 0
+    else:
+        # Past the last page there is no row to carry the total.
+        total = await get_total_posts(db) if cursor is not None or skip else 0
+    return FeedPage(posts, total, has_more, next_cursor)
+
+
+async def fetch_user_feed(
+    db: AsyncSession,
+    user_id: int,
+    limit: int,
+    cursor: str | None = None,
+    skip: int = 0,
+) -> tuple[models.User | None, FeedPage]:
+    """Return (user, page); user is None if the user does not exist."""
+    rows = (await db.execute(user_feed_query(user_id, limit, cursor=cursor, skip=skip))).all()
+    if rows:
+        user = rows[0].User
+    else:
+        # A cursor or offset past the user's last post filters out the user row too.
+        user = await db.get(models.User, user_id)
+    if user is None:
+        return None, FeedPage([], 0, False, None)
+    posts, has_more, next_cursor = split_feed_page(
+        [post for _, post in rows if post is not None],
+        limit,
+    )
+    return user, FeedPage(posts, user.post_count, has_more, next_cursor)
+
+
+# Built once: constructing a TypeAdapter compiles its validator and serializer.
+_paginated_posts_adapter = TypeAdapter(PaginatedPostsResponse)
+
+
+def paginated_posts_response(
+    posts: Sequence[models.Post],
+    *,
+    total: int,
+    skip: int,
+    limit: int,
+    has_more: bool,
+    next_cursor: str | None,
+    headers: dict[str, str] | None = None,
+) -> Response:
+    """Serialize a feed page straight from ORM rows to JSON bytes.
+
+    The rows are validated once (from attributes) and dumped by pydantic-core,
+    and the raw Response skips FastAPI's response_model re-validation. Routes
+    keep response_model=PaginatedPostsResponse for the OpenAPI schema.
+    """
+    page = _paginated_posts_adapter.validate_python(
+        {
+            "posts": posts,
+            "total": total,
+            "skip": skip,
+            "limit": limit,
+            "has_more": has_more,
+            "next_cursor": next_cursor,
+        },
+        from_attributes=True,
+    )
+    return Response(
+        _paginated_posts_adapter.dump_json(page),
+        media_type="application/json",
+        headers=headers,
+    )
@@ -1,34 +1,251 @@
-import uuid
+import asyncio
+import hashlib
+import multiprocessing
+import time
+import weakref
+from collections.abc import AsyncIterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from io import BytesIO
-from pathlib import Path
+from typing import NamedTuple
 
+from fastapi import HTTPException, UploadFile, status
 from PIL import Image, ImageOps
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-PROFILE_PICS_DIR = Path("media/profile_pics")
+import models
+from config import settings
+from executor_utils import BoundedExecutor
+from middleware import upload_too_large
+from storage import media_storage
 
-def process_profile_image(content:bytes) -> str:
+SAVE_OPTIONS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpg": {"format": "JPEG", "quality": 85, "optimize": True, "progressive": True},
+}
+IMAGE_STAGES = ("decode", "transpose", "resize", "encode")
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Leading bytes of the accepted formats; WebP is a RIFF file with WEBP at offset 8.
+IMAGE_SIGNATURES = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n", b"GIF87a", b"GIF89a")
+
+
+def profile_image_name(content: bytes) -> str:
+    """Content-addressed name for an upload: identical files get the same name."""
+    return hashlib.sha256(content).hexdigest()[:32]
+
+
+def looks_like_image(header: bytes) -> bool:
+    return header.startswith(IMAGE_SIGNATURES) or (
+        header.startswith(b"RIFF") and header[8:12] == b"WEBP"
+    )
+
+
+def invalid_image() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid image file. Please upload a valid image (JPEG, PNG, GIF, WebP).",
+    )
+
+
+async def read_image_upload(file: UploadFile, max_bytes: int) -> bytes:
+    """Read an uploaded image in chunks, stopping at the first sign it is unacceptable.
+
+    The first chunk's signature is checked before anything else is read, and
+    reading stops as soon as the running size passes max_bytes, so neither a
+    non-image nor an oversized file is ever held in memory in full.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise upload_too_large(max_bytes)
+
+    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    if not looks_like_image(chunk):
+        raise invalid_image()
+
+    chunks = []
+    size = 0
+    while chunk:
+        size += len(chunk)
+        if size > max_bytes:
+            raise upload_too_large(max_bytes)
+        chunks.append(chunk)
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    return b"".join(chunks)
+
+
+class ProcessedImage(NamedTuple):
+    variants: dict[str, bytes]
+    image_file: str
+    timings: dict[str, float]
+
+
+def process_profile_image(content: bytes) -> ProcessedImage:
+    """Render every size and format of a profile picture.
+
+    variants maps filename to bytes; image_file is the content hash stored on
+    the user and shared by all of the variant filenames. timings holds the
+    seconds spent in each of IMAGE_STAGES.
+    Raises Image.DecompressionBombError for images over
+    settings.image_max_pixels, checked from the header before decoding.
+    """
+    image_file = profile_image_name(content)
+    variants = {}
+    timings = dict.fromkeys(IMAGE_STAGES, 0.0)
+    started = time.perf_counter()
     # Open the image from bytes
     with Image.open(BytesIO(content)) as original:
+        if original.width * original.height > settings.image_max_pixels:
+            raise Image.DecompressionBombError(
+                f"{original.width}x{original.height} is over {settings.image_max_pixels} pixels",
+            )
+        # JPEG can decode straight at 1/2, 1/4 or 1/8 scale; ask for the
+        # smallest scale that still covers the largest variant, so a 20MP photo
+        # is never decoded at full size just to make a 300px avatar.
+        original.draft("RGB", (models.PROFILE_IMAGE_SIZES[-1],) * 2)
+        original.load()
+        timings["decode"] = time.perf_counter() - started
+
+        started = time.perf_counter()
         img = ImageOps.exif_transpose(original)
-        
-        img = ImageOps.fit(img,(300,300), method = Image.Resampling.LANCZOS)
-        
-        if img.mode in ("RGBA", "LA", "P"):
+        if img.mode not in ("RGB", "L"):
             img = img.convert("RGB")
-            
-        filename = f"{uuid.uuid4().hex}.jpg"
-        filepath= PROFILE_PICS_DIR / filename
-        
-        PROFILE_PICS_DIR.mkdir(parents=True, exist_ok=True)
-                               
-        img.save(filepath, format="JPEG", quality=85, optimize=True)
-        
-    return filename
-    
-    def delete_profile_image(filename:str | None) -> None:
-        if filename is None:
-            return
-        
-        filepath = PROFILE_PICS_DIR / filename
-        if filepath.exists():
-            filepath.unlink()
+        timings["transpose"] = time.perf_counter() - started
+
+        # Crop once at the largest size, then downscale the crop for the others.
+        largest = ImageOps.fit(
+            img,
+            (models.PROFILE_IMAGE_SIZES[-1],) * 2,
+            method=Image.Resampling.LANCZOS,
+        )
+        for size in models.PROFILE_IMAGE_SIZES:
+            started = time.perf_counter()
+            resized = largest if size == largest.width else largest.resize(
+                (size, size),
+                Image.Resampling.LANCZOS,
+            )
+            timings["resize"] += time.perf_counter() - started
+
+            started = time.perf_counter()
+            for ext, options in SAVE_OPTIONS.items():
+                output = BytesIO()
+                resized.save(output, **options)
+                variants[f"{image_file}_{size}.{ext}"] = output.getvalue()
+            timings["encode"] += time.perf_counter() - started
+
+    return ProcessedImage(variants, image_file, timings)
+
+
+class StageTimings:
+    """Running totals of per-stage durations reported by image workers."""
+
+    def __init__(self, stages: tuple[str, ...]) -> None:
+        self.count = 0
+        self.total = dict.fromkeys(stages, 0.0)
+        self.max = dict.fromkeys(stages, 0.0)
+
+    def record(self, timings: dict[str, float]) -> None:
+        self.count += 1
+        for stage, seconds in timings.items():
+            self.total[stage] += seconds
+            self.max[stage] = max(self.max[stage], seconds)
+
+    def stats(self) -> dict[str, float]:
+        count = self.count or 1
+        stats = {}
+        for stage in self.total:
+            stats[f"{stage}_avg_ms"] = round(self.total[stage] / count * 1000, 3)
+            stats[f"{stage}_max_ms"] = round(self.max[stage] * 1000, 3)
+        return stats
+
+
+# Resizing and encoding hold the GIL for most of their run, so in threads they
+# would stall request handling; separate processes keep them off the server's
+# interpreter entirely. Spawned rather than forked so workers do not inherit
+# the event loop, its threads or open database connections.
+def _image_process_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=settings.image_process_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+image_executor = BoundedExecutor(
+    "image-processing",
+    _image_process_pool(),
+    max_workers=settings.image_process_workers,
+    max_queue=settings.image_process_max_queue,
+    executor_factory=_image_process_pool,
+)
+image_stage_timings = StageTimings(IMAGE_STAGES)
+
+
+async def process_profile_image_async(content: bytes) -> tuple[dict[str, bytes], str]:
+    """Process an upload on image_executor; raises a 503 when it is saturated or broken."""
+    variants, image_file, timings = await image_executor.run(process_profile_image, content)
+    image_stage_timings.record(timings)
+    return variants, image_file
+
+
+async def profile_image_in_use(db: AsyncSession, image_file: str) -> bool:
+    """Whether any user references this picture."""
+    query = select(models.User.id).where(models.User.image_file == image_file).limit(1)
+    return (await db.execute(query)).first() is not None
+
+
+_image_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+
+
+@asynccontextmanager
+async def profile_image_lock(db: AsyncSession, image_file: str) -> AsyncIterator[None]:
+    """Serialize the profile_image_in_use check and what follows it for one picture.
+
+    Pictures are shared by content hash, so without this an upload that finds
+    a picture in use and skips storing it can commit its reference just after
+    another user's replace or delete has found it unused and removed the
+    files. Hold it from the check through the commit on upload, and around
+    the check and delete_profile_image afterwards.
+
+    On PostgreSQL a transaction advisory lock on db's own connection extends
+    it across processes; it is released when db commits, inside the block or
+    on leaving it, so the lock never needs a second pooled connection.
+    """
+    lock = _image_locks.setdefault(image_file, asyncio.Lock())
+    async with lock:
+        if db.bind.dialect.name == "postgresql":
+            key = int.from_bytes(hashlib.blake2b(image_file.encode(), digest_size=8).digest(), "big", signed=True)
+            await db.execute(select(func.pg_advisory_xact_lock(key)))
+        try:
+            yield
+        except BaseException:
+            await db.rollback()
+            raise
+        # A no-op if the block already committed; otherwise ends the check's transaction.
+        await db.commit()
+
+
+# Names are content hashes, so the bytes behind a URL never change.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+async def upload_profile_image(variants: dict[str, bytes]) -> None:
+    await asyncio.gather(
+        *(
+            media_storage.put(
+                f"profile_pics/{filename}",
+                content,
+                content_type=models.PROFILE_IMAGE_FORMATS[filename.rsplit(".", 1)[-1]],
+                cache_control=IMMUTABLE_CACHE_CONTROL,
+            )
+            for filename, content in variants.items()
+        ),
+    )
+
+
+async def delete_profile_image(image_file: str | None) -> None:
+    """Delete every stored variant of a picture; callers check profile_image_in_use first."""
+    if image_file is None:
+        return
+    await media_storage.delete_many(
+        f"profile_pics/{filename}" for filename in models.profile_image_filenames(image_file)
+    )
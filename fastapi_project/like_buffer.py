@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+from sqlalchemy import bindparam, update
+
+import models
+from config import settings
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+
+class LikeCounterBuffer:
+    """Coalesces like/unlike increments in memory before writing posts.likes.
+
+    A popular post turns thousands of likes into one UPDATE per flush instead
+    of one contended row write per like. Flushes run every flush_interval
+    seconds, as soon as flush_threshold increments are pending, and once more
+    at shutdown. Pending increments are lost if the process dies; running
+    `python counters.py` rebuilds posts.likes from the post_likes table.
+    """
+
+    def __init__(self, flush_interval: float, flush_threshold: int) -> None:
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._pending: defaultdict[int, int] = defaultdict(int)
+        self._pending_events = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_now = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.flushes = 0
+        self.rows_flushed = 0
+
+    def add(self, post_id: int, delta: int) -> None:
+        self._pending[post_id] += delta
+        self._pending_events += 1
+        if self._pending_events >= self.flush_threshold:
+            # _run does the flush, so failures are logged and nothing is left unawaited.
+            self._flush_now.set()
+
+    def pending(self, post_id: int) -> int:
+        return self._pending.get(post_id, 0)
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            # Swap the buffer out first; likes arriving mid-flush land in the new one.
+            batch = {post_id: delta for post_id, delta in self._pending.items() if delta}
+            self._pending = defaultdict(int)
+            self._pending_events = 0
+            if not batch:
+                return 0
+
+            stmt = (
+                update(models.Post)
+                .where(models.Post.id == bindparam("post_id"))
+                .values(likes=models.Post.likes + bindparam("delta"))
+            )
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(
+                        stmt,
+                        [{"post_id": post_id, "delta": delta} for post_id, delta in batch.items()],
+                    )
+            except Exception:
+                # Put the increments back so the next flush retries them.
+                for post_id, delta in batch.items():
+                    self._pending[post_id] += delta
+                raise
+
+            self.flushes += 1
+            self.rows_flushed += len(batch)
+            return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=self.flush_interval)
+            except TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush like counters")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "pending_posts": len(self._pending),
+            "pending_events": self._pending_events,
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+        }
+
+
+like_buffer = LikeCounterBuffer(
+    settings.likes_flush_interval_seconds,
+    settings.likes_flush_threshold,
+)
@@ -1,3 +1,4 @@
+import asyncio
 from typing import Annotated
 from contextlib import asynccontextmanager
 from fastapi.exception_handlers import (
@@ -6,56 +7,118 @@ from fastapi.exception_handlers import (
 )
 
 from fastapi import Depends,FastAPI,Request,HTTPException, status
+from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi.exceptions import RequestValidationError
 from config import settings
-from sqlalchemy import select,func
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 import models
-from routers import posts, users
-from database import Base, engine, get_db
+from auth import password_hash_executor
+from routers import internal, posts, users
+from database import engine, get_read_db, read_engine, reads_from_primary
+from email_outbox import email_outbox
+from feed_utils import fetch_feed, fetch_user_feed
+from image_utils import image_executor
+from like_buffer import like_buffer
+from middleware import CompressionMiddleware, ReadYourWritesMiddleware, UploadSizeLimitMiddleware
+from page_cache import page_cache
+from pool_stats import pool_monitor
+from static_assets import asset_url, import_map, media_files, static_files
+from token_sweeper import reset_token_sweeper
+from storage import media_storage
 from config import settings 
 
 @asynccontextmanager
 async def lifespan(_app:FastAPI):
+    like_buffer.start()
+    email_outbox.start()
+    reset_token_sweeper.start()
+    pool_logger = None
+    if settings.db_pool_log_interval_seconds > 0:
+        pool_logger = asyncio.create_task(
+            pool_monitor.run_logger(settings.db_pool_log_interval_seconds),
+        )
     yield
     # Shutdown code 
-    await engine.dispose()   
+    if pool_logger is not None:
+        pool_logger.cancel()
+    await like_buffer.stop()
+    await email_outbox.stop()
+    await reset_token_sweeper.stop()
+    password_hash_executor.shutdown()
+    image_executor.shutdown()
+    await media_storage.close()
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()   
     
     # Async does not support lazy relationship loading after the request session closes,
     # so use selectinload(models.Post.author) when templates/API responses need author data.
     
 app = FastAPI(title=settings.app_name, debug=settings.debug, lifespan=lifespan)
 
-app.mount("/media", StaticFiles(directory = "media"), name="media")
-app.mount("/static", StaticFiles(directory=settings.static_dir), name="static")
+if settings.read_database_url:
+    app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_upload_bytes=settings.max_upload_size_bytes,
+    path_pattern=r"/api/users/\d+/picture",
+)
+# Added last so it is outermost and sees every other middleware's headers.
+app.add_middleware(
+    CompressionMiddleware,
+    levels=settings.compression_levels,
+    minimum_size=settings.compression_min_size,
+    compress_streaming=settings.compression_streaming,
+    thread_min_size=settings.compression_thread_min_size,
+)
+
+app.mount("/media", media_files(), name="media")
+app.mount("/static", static_files(), name="static")
 
 templates = Jinja2Templates(directory=settings.templates_dir)
+templates.env.globals.update(asset_url=asset_url, import_map=import_map)
+
+
+def cached_page_response(request: Request) -> HTMLResponse | None:
+    # A client pinned to the primary has just written; render fresh for it.
+    if read_engine is not engine and reads_from_primary(request):
+        return None
+    # The full URL is the key: it covers route and query parameters, and the host
+    # matters because url_for() renders absolute links into the page.
+    body = page_cache.get(str(request.url))
+    if body is None:
+        return None
+    return HTMLResponse(body, headers={"X-Cache": "HIT"})
+
+
+def cache_page_response(request, response, tags: tuple[str, ...], version: int):
+    # A replica can lag a just-invalidated write, so pages read from it are not
+    # stored until the read-your-writes window after the last invalidation has passed.
+    settle_seconds = 0 if reads_from_primary(request) else settings.read_your_writes_seconds
+    page_cache.set(str(request.url), response.body, tags, version, settle_seconds)
+    response.headers["X-Cache"] = "MISS"
+    return response
 
 app.include_router(users.router)
 app.include_router(posts.router)
+if settings.internal_endpoints_enabled:
+    app.include_router(internal.router)
 
 @app.get("/",include_in_schema=False, name="home")
 @app.get("/posts", include_in_schema=False, name="posts")
-async def home(request: Request, db:Annotated[AsyncSession, Depends(get_db)]):
-    count_result = await db.execute(select(func.count()).select_from(models.Post))
-    total = count_result.scalar() or 0
-    
-    result = await db.execute(
-        select(models.Post)
-        .options(selectinload(models.Post.author))
-        .order_by(models.Post.date_posted.desc())
-        .limit(settings.posts_per_page)   
-    )
-    posts = result.scalars().all()
-    
-    has_more = len(posts) < total
+async def home(request: Request, db:Annotated[AsyncSession, Depends(get_read_db)]):
+    if cached := cached_page_response(request):
+        return cached
+    cache_version = page_cache.version
+
+    posts, _total, has_more, next_cursor = await fetch_feed(db, settings.posts_per_page)
     
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         request,
         "home.html", 
         { 
@@ -63,12 +126,14 @@ async def home(request: Request, db:Annotated[AsyncSession, Depends(get_db)]):
 	         "title": "Home",
 	         "limit": settings.posts_per_page,
 	         "has_more": has_more,
+	         "next_cursor": next_cursor,
 	        }
     )
+    return cache_page_response(request, response, ("home",), cache_version)
 
 # get post by id, if post exists return post, if not raise 404 error
 @app.get("/posts/{post_id}", include_in_schema=False, name="post_page")
-async def post_page(request: Request, post_id: int, db:Annotated[AsyncSession, Depends(get_db)]):
+async def post_page(request: Request, post_id: int, db:Annotated[AsyncSession, Depends(get_read_db)]):
     result = await db.execute(
         select(models.Post)
         .options(selectinload(models.Post.author))
@@ -91,35 +156,24 @@ async def post_page(request: Request, post_id: int, db:Annotated[AsyncSession, D
 async def user_posts_page(
     request: Request,
     user_id: int,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
 ):
-    result = await db.execute(select(models.User).where(models.User.id == user_id))
-    user = result.scalars().first()
+    if cached := cached_page_response(request):
+        return cached
+    cache_version = page_cache.version
+
+    user, (posts, _total, has_more, next_cursor) = await fetch_user_feed(
+        db,
+        user_id,
+        settings.posts_per_page,
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found",
         )
     
-    count_result = await db.execute(
-        select(func.count())
-        .select_from(models.Post)
-        .where(models.Post.user_id == user_id),
-    )
-    total = count_result.scalar() or 0
-
-    result = await db.execute(
-        select(models.Post)
-        .options(selectinload(models.Post.author))
-        .where(models.Post.user_id == user_id)
-        .order_by(models.Post.date_posted.desc())
-        .limit(settings.posts_per_page)
-    )
-    posts = result.scalars().all()
-    
-    has_more = len(posts) < total
-    
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         request,
         "user_posts.html",
         {
@@ -128,8 +182,10 @@ async def user_posts_page(
             "title": f"{user.username}'s Posts",
             "limit": settings.posts_per_page,
             "has_more": has_more,
+            "next_cursor": next_cursor,
         },
     )
+    return cache_page_response(request, response, (f"user:{user_id}",), cache_version)
 
 
 ## login and register template routes
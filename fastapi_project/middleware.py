@@ -0,0 +1,254 @@
+import re
+import time
+from collections.abc import Callable
+from typing import Any
+
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from compression import ENCODINGS, MAX_LEVELS, compress, compression_stats, stream_compressor
+from config import settings
+from database import READ_PRIMARY_COOKIE
+from static_assets import accepted_encodings
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class ReadYourWritesMiddleware:
+    """Pins a client's reads to the primary for a short window after it writes.
+
+    Any successful non-GET response sets a cookie holding the window's end time;
+    database.get_read_db checks it. Plain ASGI (not BaseHTTPMiddleware) so
+    it adds nothing to streaming responses.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                window = settings.read_your_writes_seconds
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "set-cookie",
+                    f"{READ_PRIMARY_COOKIE}={time.time() + window:.0f}; Max-Age={window}; "
+                    "Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+def upload_too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+        detail=f"File too large. Maximum size is {max_bytes // (1024 * 1024)}MB",
+    )
+
+
+# Room for the multipart boundaries and part headers around the file itself.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    """Stops oversized uploads while the body is still arriving.
+
+    Starlette spools a whole multipart body before the endpoint runs, so a size
+    check in the endpoint comes too late. Requests to matching paths are
+    rejected up front when Content-Length is over the limit; otherwise the body
+    is counted as it is received and parsing is aborted with a 413 as soon as
+    the count crosses it (FastAPI re-raises HTTPExceptions from body parsing).
+    """
+
+    def __init__(self, app: ASGIApp, max_upload_bytes: int, path_pattern: str) -> None:
+        self.app = app
+        self.max_upload_bytes = max_upload_bytes
+        self.max_body_bytes = max_upload_bytes + MULTIPART_OVERHEAD_BYTES
+        self.path_pattern = re.compile(path_pattern)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] in SAFE_METHODS
+            or not self.path_pattern.fullmatch(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            error = upload_too_large(self.max_upload_bytes)
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    raise upload_too_large(self.max_upload_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _route_name(scope: Scope) -> str:
+    # The router stores the matched route in the scope it was handed; a Mount
+    # records its prefix, so every file under /static shares one entry.
+    # Requests that matched nothing share a single bucket whatever their method
+    # and path; keyed by what clients send, the table would grow without limit.
+    path = getattr(scope.get("route"), "path", None)
+    if path is None:
+        return "<unmatched>"
+    return f"{scope['method']} {path}"
+
+
+def _timed(fn: Callable[..., bytes], *args: Any) -> tuple[bytes, float]:
+    # CPU time of the thread that ran fn, whether the event loop's or a worker's.
+    started = time.thread_time()
+    result = fn(*args)
+    return result, time.thread_time() - started
+
+
+class CompressionMiddleware:
+    """Compresses responses with the best encoding the client accepts.
+
+    Only media types listed in levels are compressed, at that type's level for
+    the chosen encoding, and only bodies of at least minimum_size bytes.
+    Responses that arrive in several messages (StreamingResponse, large files)
+    are compressed chunk by chunk when compress_streaming is set and passed
+    through otherwise. Responses that already carry a Content-Encoding, such as
+    the precompressed static assets, are left alone. Ratios and CPU time go to
+    compression_stats per route.
+
+    Bodies and chunks of at least thread_min_size bytes are compressed in the
+    thread pool, as a large page costs milliseconds of CPU that would
+    otherwise stall the event loop. Levels are capped at MAX_LEVELS.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        levels: dict[str, dict[str, int]],
+        minimum_size: int = 1024,
+        compress_streaming: bool = False,
+        thread_min_size: int = 64 * 1024,
+    ) -> None:
+        self.app = app
+        self.levels = {
+            media_type: {
+                encoding: min(level, MAX_LEVELS.get(encoding, level))
+                for encoding, level in by_encoding.items()
+            }
+            for media_type, by_encoding in levels.items()
+        }
+        self.minimum_size = minimum_size
+        self.compress_streaming = compress_streaming
+        self.thread_min_size = thread_min_size
+
+    def _level(self, headers: MutableHeaders, encoding: str) -> int | None:
+        media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+        return self.levels.get(media_type, {}).get(encoding)
+
+    async def _compress(self, size: int, fn: Callable[..., bytes], *args: Any) -> tuple[bytes, float]:
+        if size >= self.thread_min_size:
+            return await run_in_threadpool(_timed, fn, *args)
+        return _timed(fn, *args)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        encoding = next((name for name in ENCODINGS if name in accepted), None)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message | None = None
+        passthrough = False
+        stream: tuple | None = None
+        raw_bytes = compressed_bytes = 0
+        cpu_seconds = 0.0
+
+        async def skip(reason: str, message: Message) -> None:
+            nonlocal passthrough
+            passthrough = True
+            compression_stats.skip(reason)
+            await send(start_message)
+            await send(message)
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, stream, raw_bytes, compressed_bytes, cpu_seconds
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is None:
+                headers = MutableHeaders(scope=start_message)
+                level = self._level(headers, encoding)
+                if start_message["status"] < 200 or start_message["status"] in (204, 304):
+                    return await skip("no_body", message)
+                if "content-encoding" in headers or "no-transform" in headers.get("cache-control", ""):
+                    return await skip("encoded", message)
+                if level is None:
+                    return await skip("content_type", message)
+                if more_body and not self.compress_streaming:
+                    return await skip("streaming", message)
+                if not more_body and len(body) < self.minimum_size:
+                    return await skip("too_small", message)
+
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                # The compressed bytes differ, so a strong validator would be wrong.
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+
+                if not more_body:
+                    compressed, cpu_seconds = await self._compress(len(body), compress, encoding, level, body)
+                    headers["Content-Length"] = str(len(compressed))
+                    compression_stats.record(_route_name(scope), encoding, len(body), len(compressed), cpu_seconds)
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+
+                del headers["Content-Length"]
+                stream = stream_compressor(encoding, level)
+                await send(start_message)
+
+            compress_chunk, finish = stream
+
+            def compress_message() -> bytes:
+                compressed = compress_chunk(body)
+                return compressed + finish() if not more_body else compressed
+
+            compressed, chunk_cpu_seconds = await self._compress(len(body), compress_message)
+            cpu_seconds += chunk_cpu_seconds
+            raw_bytes += len(body)
+            compressed_bytes += len(compressed)
+            if not more_body:
+                compression_stats.record(_route_name(scope), encoding, raw_bytes, compressed_bytes, cpu_seconds)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -2,11 +2,61 @@ from __future__ import annotations
 
 from datetime import UTC, datetime
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    DDL,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    event,
+    func,
+    text,
+)
+# Unused by name, but must be imported before post_search_vector below is
+# built: it registers PostgreSQL's typed func.to_tsvector() and friends, and
+# without it compiling ix_posts_search for PostgreSQL raises CompileError.
+from sqlalchemy.dialects import postgresql  # noqa: F401
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from config import settings
 from database import Base
+from storage import media_storage
+
+
+# Profile pictures are stored as one file per size and format, named
+# <content hash>_<size>.<ext>, and User.image_file holds just the hash. Uploads
+# from before variants existed are a single 300px JPEG whose image_file keeps
+# its extension.
+PROFILE_IMAGE_SIZES = (48, 128, 300)
+PROFILE_IMAGE_FORMATS = {"webp": "image/webp", "jpg": "image/jpeg"}
+
+
+def has_image_variants(image_file: str) -> bool:
+    return "." not in image_file
+
+
+def profile_image_variant(image_file: str, size: int, ext: str = "jpg") -> str:
+    """Filename of the smallest stored variant at least size pixels wide."""
+    if not has_image_variants(image_file):
+        return image_file
+    fitting = next((s for s in PROFILE_IMAGE_SIZES if s >= size), PROFILE_IMAGE_SIZES[-1])
+    return f"{image_file}_{fitting}.{ext}"
+
+
+def profile_image_filenames(image_file: str) -> list[str]:
+    """Every stored file belonging to one profile picture."""
+    if not has_image_variants(image_file):
+        return [image_file]
+    return [
+        f"{image_file}_{size}.{ext}"
+        for size in PROFILE_IMAGE_SIZES
+        for ext in PROFILE_IMAGE_FORMATS
+    ]
+
+
+def profile_image_url(filename: str) -> str:
+    return media_storage.url(f"profile_pics/{filename}")
 
 
 class User(Base):
@@ -20,6 +70,14 @@ class User(Base):
         String(200),
         nullable=True,
         default=None,
+        # Pictures are shared by content hash; deletes check for other users first.
+        index=True,
+    )
+    post_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(UTC),
+        onupdate=lambda: datetime.now(UTC),
     )
 
     posts: Mapped[list[Post]] = relationship(
@@ -34,12 +92,37 @@ class User(Base):
 
     @property
     def image_path(self) -> str:
-        if self.image_file and settings.s3_bucket_name:
-            return f"https://{settings.s3_bucket_name}.s3.{settings.s3_region}.amazonaws.com/profile_pics/{self.image_file}"
+        return self.image_url(PROFILE_IMAGE_SIZES[-1])
+
+    def image_url(self, size: int, ext: str = "jpg") -> str:
+        """URL of the smallest stored picture that is at least size pixels wide."""
         if self.image_file:
-            return f"/media/profile_pics/{self.image_file}"
+            return profile_image_url(profile_image_variant(self.image_file, size, ext))
         return "/static/profile_pics/default.jpg"
 
+    @property
+    def has_image_variants(self) -> bool:
+        return bool(self.image_file) and has_image_variants(self.image_file)
+
+    def srcset(self, ext: str = "jpg") -> str:
+        """A srcset listing every stored width, so browsers pick the smallest that fits."""
+        if not self.has_image_variants:
+            return self.image_path
+        return ", ".join(
+            f"{profile_image_url(f'{self.image_file}_{size}.{ext}')} {size}w"
+            for size in PROFILE_IMAGE_SIZES
+        )
+
+    @property
+    def image_srcset(self) -> str:
+        return self.srcset()
+
+
+# Usernames keep their display case but must be unique case-insensitively; this
+# index enforces that and serves the lower(username) lookups. Emails are always
+# stored lowercased, so their plain unique index is enough.
+Index("ix_users_username_lower", func.lower(User.username), unique=True)
+
 
 class Post(Base):
     __tablename__ = "posts"
@@ -57,19 +140,115 @@ class Post(Base):
         default=lambda: datetime.now(UTC),
     )
     likes: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(UTC),
+        onupdate=lambda: datetime.now(UTC),
+    )
 
     author: Mapped[User] = relationship(back_populates="posts")
 
 
+# Feed indexes: both match the (date_posted DESC, id DESC) feed order exactly, so
+# feed pages and cursor ranges are read straight off the index with no sort step.
+Index("ix_posts_date_posted_id", Post.date_posted.desc(), Post.id.desc())
+Index(
+    "ix_posts_user_id_date_posted",
+    Post.user_id,
+    Post.date_posted.desc(),
+    Post.id.desc(),
+)
+
+# Full-text search (see search_utils.py).
+# PostgreSQL: a GIN index over a weighted tsvector expression. Search queries
+# build their match condition from post_search_vector so the planner can use it.
+POST_SEARCH_CONFIG = text("'english'")
+post_search_vector = func.setweight(
+    func.to_tsvector(POST_SEARCH_CONFIG, Post.title),
+    text("'A'"),
+).op("||")(
+    func.setweight(
+        func.to_tsvector(POST_SEARCH_CONFIG, Post.content),
+        text("'B'"),
+    ),
+)
+Index("ix_posts_search", post_search_vector, postgresql_using="gin").ddl_if(
+    dialect="postgresql",
+)
+
+# SQLite: an external-content FTS5 table over posts, kept in sync by triggers so
+# every write path (ORM, bulk inserts, cascades) updates the index. Titles weigh
+# ten times as much as content in the bm25 rank.
+POSTS_FTS_DDL = (
+    "CREATE VIRTUAL TABLE posts_fts USING fts5("
+    "title, content, content='posts', content_rowid='id', tokenize='porter unicode61')",
+    "INSERT INTO posts_fts(posts_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    "CREATE TRIGGER posts_fts_insert AFTER INSERT ON posts BEGIN "
+    "INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content); "
+    "END",
+    "CREATE TRIGGER posts_fts_delete AFTER DELETE ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); "
+    "END",
+    "CREATE TRIGGER posts_fts_update AFTER UPDATE OF title, content ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content); "
+    "END",
+)
+for statement in POSTS_FTS_DDL:
+    event.listen(Post.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(
+    Post.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS posts_fts").execute_if(dialect="sqlite"),
+)
+
+
+class PostLike(Base):
+    """One row per (user, post) like; the primary key enforces one like per user."""
+
+    __tablename__ = "post_likes"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    post_id: Mapped[int] = mapped_column(
+        ForeignKey("posts.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(UTC),
+    )
+
+
+class PostStats(Base):
+    """Single-row table holding site-wide counters (see counters.py)."""
+
+    __tablename__ = "post_stats"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    post_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
+
 class PasswordResetToken(Base):
     __tablename__ = "password_reset_tokens"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id"),
+        nullable=False,
+        index=True,
+    )
     token_hash: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    # Indexed for token_sweeper.py, which deletes expired rows oldest first.
     expires_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         nullable=False,
+        index=True,
     )
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
@@ -77,3 +256,40 @@ class PasswordResetToken(Base):
     )
 
     user: Mapped[User] = relationship(back_populates="reset_tokens")
+
+
+class EmailOutbox(Base):
+    """Outgoing mail, written in the same transaction as the change that triggers it.
+
+    email_outbox.py drains due rows over pooled SMTP connections. Sent rows are
+    deleted; failures are retried with backoff until next_attempt_at is cleared
+    after the last attempt, leaving the row and its last_error for inspection
+    with the body scrubbed. Mail carrying a secret, such as a reset link, sets
+    expires_at to the secret's own expiry: past it the row is deleted unsent,
+    by the worker or by token_sweeper.py, so the link never outlives its token.
+    """
+
+    __tablename__ = "email_outbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    to_email: Mapped[str] = mapped_column(String(120), nullable=False)
+    subject: Mapped[str] = mapped_column(String(200), nullable=False)
+    plain_text: Mapped[str] = mapped_column(Text, nullable=False)
+    html_content: Mapped[str | None] = mapped_column(Text, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    next_attempt_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(UTC),
+        nullable=True,
+        index=True,
+    )
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    expires_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        index=True,
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(UTC),
+    )
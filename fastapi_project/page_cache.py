@@ -0,0 +1,12 @@
+from cache_utils import PageCache
+from config import settings
+
+# Rendered HTML for the home and user-posts pages. Pages are the same for every
+# visitor (login state lives in the browser), so whole responses are cached.
+# Tags: "home" for the main feed, "user:<id>" for a user's posts page.
+page_cache = PageCache(settings.page_cache_max_bytes, settings.page_cache_ttl_seconds)
+
+
+def invalidate_user_pages(user_id: int) -> None:
+    """Drop cached pages showing this user's posts or profile."""
+    page_cache.invalidate("home", f"user:{user_id}")
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMonitor:
+    """Connection pool counters collected from SQLAlchemy pool events.
+
+    Each attached engine is tracked under its own name ("primary", "replica").
+    Cumulative totals are served by /internal/db-pool; log_window() reports
+    and resets the per-interval numbers for the periodic log line.
+    """
+
+    def __init__(self) -> None:
+        self.engines: dict[str, Engine] = {}
+        self.totals: dict[str, dict[str, float]] = {}
+        self.window: dict[str, dict[str, float]] = {}
+        self.window_started = time.monotonic()
+
+    @staticmethod
+    def _empty_counters() -> dict[str, float]:
+        return {
+            "checkouts": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+            "connects": 0,
+            "closes": 0,
+            "invalidations": 0,
+        }
+
+    def _add(self, name: str, key: str, value: float = 1) -> None:
+        self.totals[name][key] += value
+        self.window[name][key] += value
+
+    def record_wait(self, name: str | None, seconds: float) -> None:
+        if name not in self.totals:
+            return
+        self._add(name, "checkouts")
+        self._add(name, "wait_total", seconds)
+        for counters in (self.totals[name], self.window[name]):
+            counters["wait_max"] = max(counters["wait_max"], seconds)
+
+    def attach(self, engine: Engine, name: str) -> None:
+        self.engines[name] = engine
+        engine.pool.monitor_name = name
+        self.totals[name] = self._empty_counters()
+        self.window[name] = self._empty_counters()
+        event.listen(engine, "connect", lambda *_: self._add(name, "connects"))
+        event.listen(engine, "close", lambda *_: self._add(name, "closes"))
+        event.listen(engine, "close_detached", lambda *_: self._add(name, "closes"))
+        event.listen(engine, "invalidate", lambda *_: self._add(name, "invalidations"))
+
+    def gauges(self, name: str) -> dict[str, int]:
+        pool = self.engines[name].pool
+        if not isinstance(pool, AsyncAdaptedQueuePool):
+            return {}
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        }
+
+    @staticmethod
+    def _summary(counters: dict[str, float]) -> dict[str, float]:
+        checkouts = counters["checkouts"] or 1
+        return {
+            "checkouts": int(counters["checkouts"]),
+            "wait_avg_ms": round(counters["wait_total"] / checkouts * 1000, 3),
+            "wait_max_ms": round(counters["wait_max"] * 1000, 3),
+            "connects": int(counters["connects"]),
+            "closes": int(counters["closes"]),
+            "invalidations": int(counters["invalidations"]),
+        }
+
+    def stats(self) -> dict:
+        return {
+            name: {**self.gauges(name), "totals": self._summary(self.totals[name])}
+            for name in self.engines
+        }
+
+    def log_window(self) -> None:
+        elapsed = time.monotonic() - self.window_started
+        self.window_started = time.monotonic()
+        for name in self.engines:
+            window = self._summary(self.window[name])
+            self.window[name] = self._empty_counters()
+            logger.info(
+                "db pool %s %s | last %.0fs: checkouts=%d wait_avg=%.1fms wait_max=%.1fms "
+                "connects=%d closes=%d invalidations=%d",
+                name,
+                " ".join(f"{key}={value}" for key, value in self.gauges(name).items()),
+                elapsed,
+                window["checkouts"],
+                window["wait_avg_ms"],
+                window["wait_max_ms"],
+                window["connects"],
+                window["closes"],
+                window["invalidations"],
+            )
+
+    async def run_logger(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.log_window()
+
+
+pool_monitor = PoolMonitor()
+
+
+class MonitoredQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that times how long each checkout waits.
+
+    SQLAlchemy has no "checkout requested" event, so the wait (queueing for a
+    free slot plus any new connection it has to open) is timed around _do_get.
+    monitor_name is set by PoolMonitor.attach and survives engine.dispose().
+    """
+
+    monitor_name: str | None = None
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.monitor_name = self.monitor_name
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_monitor.record_wait(self.monitor_name, time.perf_counter() - started)
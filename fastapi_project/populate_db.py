@@ -6,10 +6,10 @@ import httpx
 from sqlalchemy import delete, select, update
 
 import models
-from config import settings
+from counters import reconcile_post_counts
 from database import AsyncSessionLocal, engine
-from image_utils import _get_s3_client
 from main import app
+from storage import media_storage
 
 POPULATE_IMAGES_DIR = Path("populate_images")
 
@@ -235,26 +235,29 @@ POST_44 = {
 
 
 async def clear_existing_data() -> None:
-    # Delete profile pictures from S3 (need DB records to know which files)
+    # Delete profile pictures from media storage (need DB records to know which files)
     async with AsyncSessionLocal() as db:
         result = await db.execute(
             select(models.User.image_file).where(models.User.image_file.is_not(None)),
         )
         filenames = result.scalars().all()
 
-    if filenames:
-        s3 = _get_s3_client()
-        s3.delete_objects(
-            Bucket=settings.s3_bucket_name,
-            Delete={"Objects": [{"Key": f"profile_pics/{f}"} for f in filenames]},
-        )
-        print(f"Deleted {len(filenames)} images from S3")
+    keys = [
+        f"profile_pics/{filename}"
+        for image_file in set(filenames)
+        for filename in models.profile_image_filenames(image_file)
+    ]
+    if keys:
+        await media_storage.delete_many(keys)
+        print(f"Deleted {len(keys)} profile picture files")
 
     # Clear database tables (order respects foreign keys)
     async with AsyncSessionLocal() as db:
         await db.execute(delete(models.PasswordResetToken))
+        await db.execute(delete(models.PostLike))
         await db.execute(delete(models.Post))
         await db.execute(delete(models.User))
+        await reconcile_post_counts(db)
         await db.commit()
     print("Cleared existing data")
 
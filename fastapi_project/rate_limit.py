@@ -0,0 +1,118 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request, status
+
+from config import settings
+
+
+class _Shard:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+        self.evictions = 0
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets: bursts of up to capacity, refilled at per_minute.
+
+    Buckets are spread over shards by key hash, each with its own lock and its
+    own LRU of at most max_keys / shards entries, so memory stays bounded and
+    callers on different keys rarely share a lock. A key that is evicted or
+    unseen starts with a full bucket; with max_keys well above the number of
+    clients active in one refill period, eviction only drops idle buckets.
+    """
+
+    def __init__(self, capacity: int, per_minute: float, max_keys: int, shards: int = 16) -> None:
+        self.capacity = capacity
+        self.rate = per_minute / 60
+        self.max_keys_per_shard = max(max_keys // shards, 1)
+        self._shards = [_Shard() for _ in range(shards)]
+
+    def hit(self, key: str) -> float:
+        """Take a token for key; returns 0 if allowed, else seconds until one is free."""
+        shard = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        with shard.lock:
+            entry = shard.buckets.pop(key, None)
+            if entry is None:
+                tokens = float(self.capacity)
+            else:
+                tokens, updated = entry
+                tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+                shard.allowed += 1
+            else:
+                wait = (1 - tokens) / self.rate
+                shard.rejected += 1
+
+            shard.buckets[key] = (tokens, now)
+            while len(shard.buckets) > self.max_keys_per_shard:
+                shard.buckets.popitem(last=False)
+                shard.evictions += 1
+        return wait
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "capacity": self.capacity,
+            "per_minute": self.rate * 60,
+            "keys": sum(len(shard.buckets) for shard in self._shards),
+            "max_keys": self.max_keys_per_shard * len(self._shards),
+            "allowed": sum(shard.allowed for shard in self._shards),
+            "rejected": sum(shard.rejected for shard in self._shards),
+            "evictions": sum(shard.evictions for shard in self._shards),
+        }
+
+
+class AuthRateLimiter:
+    """Sheds excess load on the endpoints that hash passwords or write rows.
+
+    Endpoints call check() before touching the database or the hashing pool,
+    so a credential-stuffing burst is answered with cheap 429s instead of
+    queueing argon2 work for everyone. Every auth endpoint shares one bucket
+    per client IP; logins, registrations and reset mails also draw from a
+    bucket per account (the email address), which catches attacks spread
+    across many IPs.
+    """
+
+    def __init__(self, by_ip: TokenBucketLimiter, by_account: TokenBucketLimiter) -> None:
+        self.by_ip = by_ip
+        self.by_account = by_account
+
+    def check(self, request: Request, account: str | None = None) -> None:
+        client = request.client.host if request.client else "unknown"
+        wait = self.by_ip.hit(client)
+        if not wait and account:
+            wait = self.by_account.hit(account.strip().lower())
+        if wait:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many attempts. Please try again later.",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    def stats(self) -> dict[str, dict[str, int | float]]:
+        return {"by_ip": self.by_ip.stats(), "by_account": self.by_account.stats()}
+
+
+auth_rate_limiter = AuthRateLimiter(
+    by_ip=TokenBucketLimiter(
+        settings.auth_rate_limit_ip_burst,
+        settings.auth_rate_limit_ip_per_minute,
+        settings.auth_rate_limit_max_keys,
+        settings.auth_rate_limit_shards,
+    ),
+    by_account=TokenBucketLimiter(
+        settings.auth_rate_limit_account_burst,
+        settings.auth_rate_limit_account_per_minute,
+        settings.auth_rate_limit_max_keys,
+        settings.auth_rate_limit_shards,
+    ),
+)
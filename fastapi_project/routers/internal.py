@@ -0,0 +1,85 @@
+import secrets
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from auth import auth_cache_stats, password_hash_executor
+from compression import compression_stats
+from config import settings
+from email_outbox import email_outbox
+from image_utils import image_executor, image_stage_timings
+from like_buffer import like_buffer
+from page_cache import page_cache
+from pool_stats import pool_monitor
+from rate_limit import auth_rate_limiter
+from token_sweeper import reset_token_sweeper
+
+
+def require_internal_token(x_internal_token: Annotated[str | None, Header()] = None) -> None:
+    """When internal_api_token is set, every /internal request must send it."""
+    expected = settings.internal_api_token
+    if expected is None:
+        return
+    if x_internal_token is None or not secrets.compare_digest(
+        x_internal_token.encode(),
+        expected.get_secret_value().encode(),
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+
+# Only mounted when settings.internal_endpoints_enabled is set (see main.py).
+router = APIRouter(
+    prefix="/internal",
+    include_in_schema=False,
+    dependencies=[Depends(require_internal_token)],
+)
+
+
+@router.get("/auth-cache")
+async def get_auth_cache_stats():
+    return auth_cache_stats()
+
+
+@router.get("/password-hashing")
+async def get_password_hashing_stats():
+    return password_hash_executor.stats()
+
+
+@router.get("/image-processing")
+async def get_image_processing_stats():
+    return {**image_executor.stats(), "stages": image_stage_timings.stats()}
+
+
+@router.get("/page-cache")
+async def get_page_cache_stats():
+    return page_cache.stats()
+
+
+@router.get("/like-buffer")
+async def get_like_buffer_stats():
+    return like_buffer.stats()
+
+
+@router.get("/db-pool")
+async def get_db_pool_stats():
+    return pool_monitor.stats()
+
+
+@router.get("/email-outbox")
+async def get_email_outbox_stats():
+    return email_outbox.stats()
+
+
+@router.get("/reset-token-sweeper")
+async def get_reset_token_sweeper_stats():
+    return reset_token_sweeper.stats()
+
+
+@router.get("/compression")
+async def get_compression_stats():
+    return compression_stats.stats()
+
+
+@router.get("/rate-limits")
+async def get_rate_limit_stats():
+    return auth_rate_limiter.stats()
@@ -1,49 +1,142 @@
-from typing import Annotated
+import csv
+import io
+from collections.abc import AsyncIterator
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
 import models
 from auth import CurrentUser
-from database import get_db
-from schemas import PostCreate, PostResponse, PostUpdate, PaginatedPostsResponse
+from counters import adjust_post_counts
+from config import settings
+from database import ReadSessionLocal, get_db, get_read_db
+from etag_utils import make_etag, not_modified_response, post_version, validator_headers
+from feed_utils import fetch_feed, paginated_posts_response
+from like_buffer import like_buffer
+from page_cache import invalidate_user_pages
+from search_utils import search_posts_page
+from schemas import (
+    PaginatedPostsResponse,
+    PostBatchCreate,
+    PostBatchResponse,
+    PostBatchResult,
+    PostCreate,
+    PostLikeResponse,
+    PostResponse,
+    PostSearchResponse,
+    PostUpdate,
+)
 
 router = APIRouter(prefix="/api/posts", tags=["posts"])
 
 
 @router.get("/", response_model=PaginatedPostsResponse)
 async def get_posts(
-    db: Annotated[AsyncSession,Depends(get_db)],
+    request: Request,
+    db: Annotated[AsyncSession,Depends(get_read_db)],
     skip: Annotated[int, Query(ge=0)] = 0,
     limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    cursor: str | None = None,
 ):
-    
-    count_result = await db.execute(select(func.count()).select_from(models.Post))
-    total = count_result.scalar() or 0
-    
-    result = await db.execute(
-        select(models.Post)
-        .options(selectinload(models.Post.author))
-        .order_by(models.Post.date_posted.desc())
-        .offset(skip)
-        .limit(limit)
+    posts, total, has_more, next_cursor = await fetch_feed(
+        db,
+        limit,
+        cursor=cursor,
+        skip=skip,
     )
-    posts = result.scalars().all()
-    
-    has_more = skip + len(posts) < total
-
-    return PaginatedPostsResponse(
-        posts=[PostResponse.model_validate(post) for post in posts],
-        total = total, 
-        skip = skip,
-        limit = limit,
-        has_more = has_more,
+
+    etag = make_etag(total, skip, limit, cursor, has_more, [post_version(post) for post in posts])
+    if not_modified := not_modified_response(request, etag):
+        return not_modified
+
+    return paginated_posts_response(
+        posts,
+        total=total,
+        skip=skip,
+        limit=limit,
+        has_more=has_more,
+        next_cursor=next_cursor,
+        headers=validator_headers(etag),
     )
 
+EXPORT_CSV_COLUMNS = ["id", "title", "content", "user_id", "author", "date_posted", "likes"]
+
+
+async def _export_posts(export_format: str) -> AsyncIterator[bytes]:
+    # The stream outlives the request's dependencies, so it opens its own session.
+    async with ReadSessionLocal() as db:
+        result = await db.stream_scalars(
+            select(models.Post)
+            .options(joinedload(models.Post.author))
+            .order_by(models.Post.id)
+            .execution_options(yield_per=settings.export_chunk_size)
+        )
+
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_CSV_COLUMNS)
+            yield buffer.getvalue().encode()
+
+        async for posts in result.partitions():
+            if export_format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows(
+                    [
+                        post.id,
+                        post.title,
+                        post.content,
+                        post.user_id,
+                        post.author.username,
+                        post.date_posted.isoformat(),
+                        post.likes,
+                    ]
+                    for post in posts
+                )
+                yield buffer.getvalue().encode()
+            else:
+                yield b"".join(
+                    PostResponse.model_validate(post).model_dump_json().encode() + b"\n"
+                    for post in posts
+                )
+
+
+@router.get("/export")
+async def export_posts(
+    export_format: Annotated[Literal["ndjson", "csv"], Query(alias="format")] = "ndjson",
+):
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_posts(export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="posts.{export_format}"'},
+    )
+
+
+@router.get("/search", response_model=PostSearchResponse)
+async def search_posts(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    cursor: str | None = None,
+):
+    return await search_posts_page(db, q, limit, cursor)
+
+
 @router.get("/{post_id}", response_model=PostResponse)
-async def get_post(post_id: int, db: Annotated[AsyncSession, Depends(get_db)]):
+async def get_post(
+    post_id: int,
+    request: Request,
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+):
     result = await db.execute(
         select(models.Post)
         .options(selectinload(models.Post.author))
@@ -51,6 +144,11 @@ async def get_post(post_id: int, db: Annotated[AsyncSession, Depends(get_db)]):
     )
     post = result.scalars().first()
     if post:
+        etag = make_etag(*post_version(post))
+        last_modified = max(post.updated_at, post.author.updated_at)
+        if not_modified := not_modified_response(request, etag, last_modified):
+            return not_modified
+        response.headers.update(validator_headers(etag, last_modified))
         return post
 
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
@@ -90,6 +188,7 @@ async def update_post_full(
     post.user_id = post_data.user_id
     
     await db.commit()
+    invalidate_user_pages(current_user.id)
     await db.refresh(post)
     return post
 
@@ -117,6 +216,7 @@ async def update_post_partial(
         setattr(post, field, value) 
     
     await db.commit()
+    invalidate_user_pages(current_user.id)
     await db.refresh(post,attribute_names=["author"])
     return post
         
@@ -138,10 +238,47 @@ async def create_post(
     )
     
     db.add(new_post)
+    await adjust_post_counts(db, current_user.id, 1)
     await db.commit()
+    invalidate_user_pages(current_user.id)
     await db.refresh(new_post,attribute_names=["author"])
     return new_post
 
+@router.post(
+    "/batch",
+    response_model=PostBatchResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_posts_batch(
+    batch: PostBatchCreate,
+    current_user: CurrentUser,
+    db: Annotated[AsyncSession, Depends(get_db)],
+):
+    # One multi-row INSERT ... RETURNING for the whole batch, in one transaction.
+    result = await db.scalars(
+        insert(models.Post).returning(models.Post, sort_by_parameter_order=True),
+        [
+            {"title": post.title, "content": post.content, "user_id": current_user.id}
+            for post in batch.posts
+        ],
+    )
+    new_posts = result.all()
+    await adjust_post_counts(db, current_user.id, len(new_posts))
+    await db.commit()
+    invalidate_user_pages(current_user.id)
+
+    # Every post has the same author, which is already loaded.
+    for post in new_posts:
+        set_committed_value(post, "author", current_user)
+
+    return PostBatchResponse(
+        created=len(new_posts),
+        results=[
+            PostBatchResult(index=index, post=PostResponse.model_validate(post))
+            for index, post in enumerate(new_posts)
+        ],
+    )
+
 @router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_post(
     post_id: int,
@@ -162,4 +299,61 @@ async def delete_post(
             detail="Not authorized to delete this post"
         )
     await db.delete(post)
+    await adjust_post_counts(db, post.user_id, -1)
     await db.commit()
+    invalidate_user_pages(current_user.id)
+
+
+@router.post("/{post_id}/like", response_model=PostLikeResponse)
+async def like_post(
+    post_id: int,
+    current_user: CurrentUser,
+    db: Annotated[AsyncSession, Depends(get_db)],
+):
+    post = await db.get(models.Post, post_id)
+    if not post:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+    likes = post.likes
+
+    db.add(models.PostLike(user_id=current_user.id, post_id=post_id))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Already liked: liking is idempotent, and the counter stays as it is.
+        await db.rollback()
+    else:
+        like_buffer.add(post_id, 1)
+
+    return PostLikeResponse(
+        post_id=post_id,
+        liked=True,
+        likes=likes + like_buffer.pending(post_id),
+    )
+
+
+@router.delete("/{post_id}/like", response_model=PostLikeResponse)
+async def unlike_post(
+    post_id: int,
+    current_user: CurrentUser,
+    db: Annotated[AsyncSession, Depends(get_db)],
+):
+    post = await db.get(models.Post, post_id)
+    if not post:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+    likes = post.likes
+
+    result = await db.execute(
+        delete(models.PostLike).where(
+            models.PostLike.user_id == current_user.id,
+            models.PostLike.post_id == post_id,
+        ),
+    )
+    await db.commit()
+    if result.rowcount:
+        like_buffer.add(post_id, -1)
+
+    return PostLikeResponse(
+        post_id=post_id,
+        liked=False,
+        likes=likes + like_buffer.pending(post_id),
+    )
@@ -1,22 +1,22 @@
 from datetime import UTC, datetime, timedelta
 from typing import Annotated
 
-from botocore.exceptions import ClientError
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     Depends,
     HTTPException,
     Query,
+    Request,
+    Response,
     UploadFile,
     status
 )
 from fastapi.security import OAuth2PasswordRequestForm
-from PIL import UnidentifiedImageError
+from PIL import Image, UnidentifiedImageError
 from sqlalchemy import delete as sql_delete
-from sqlalchemy import func, select
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 from starlette.concurrency import run_in_threadpool
 
 import models
@@ -24,33 +24,44 @@ from auth import (
     CurrentUser,
     create_access_token,
     generate_password_reset_token,
-    hash_password,
+    hash_password_async,
     hash_reset_token,
-    verify_password,
+    invalidate_cached_user,
+    verify_password_async,
 )
 from config import settings
-from database import get_db
-from email_utils import send_password_reset_email
+from counters import adjust_global_post_count
+from database import get_db, get_read_db
+from email_outbox import email_outbox
+from email_utils import queue_password_reset_email
+from etag_utils import make_etag, not_modified_response, post_version, validator_headers
+from feed_utils import fetch_user_feed, paginated_posts_response
 from image_utils import (
     delete_profile_image,
-    process_profile_image,
+    invalid_image,
+    process_profile_image_async,
+    profile_image_in_use,
+    profile_image_lock,
+    profile_image_name,
+    read_image_upload,
     upload_profile_image,
 )
+from page_cache import invalidate_user_pages
+from rate_limit import auth_rate_limiter
 from schemas import (
     ChangePasswordRequest,
     ForgotPasswordRequest,
     PaginatedPostsResponse,
-    PostResponse,
     ResetPasswordRequest,
     Token,
     UserCreate,
     UserPrivate,
     UserPublic,
     UserUpdate,
-    PagenatedUsersResponse
 )
+from storage import StorageError
 
-router = APIRouter()
+router = APIRouter(prefix="/api/users", tags=["users"])
 
 
 @router.post(
@@ -58,7 +69,15 @@ router = APIRouter()
     response_model=UserPrivate,
     status_code=status.HTTP_201_CREATED,
 )
-async def create_user(user: UserCreate, db: Annotated[AsyncSession, Depends(get_db)]):
+async def create_user(
+    user: UserCreate,
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_db)],
+):
+    auth_rate_limiter.check(request, account=user.email)
+    # Hashed before the session first touches the pool, so a request queued for
+    # password_hash_executor never sits on a database connection.
+    password_hash = await hash_password_async(user.password)
     result = await db.execute(
         select(models.User).where(
             func.lower(models.User.username) == user.username.lower(),
@@ -72,7 +91,7 @@ async def create_user(user: UserCreate, db: Annotated[AsyncSession, Depends(get_
         )
 
     result = await db.execute(
-        select(models.User).where(func.lower(models.User.email) == user.email.lower()),
+        select(models.User).where(models.User.email == user.email.lower()),
     )
     existing_email = result.scalars().first()
     if existing_email:
@@ -84,10 +103,18 @@ async def create_user(user: UserCreate, db: Annotated[AsyncSession, Depends(get_
     new_user = models.User(
         username=user.username,
         email=user.email.lower(),
-        password_hash=hash_password(user.password),
+        password_hash=password_hash,
     )
     db.add(new_user)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError as err:
+        # Lost a race with a concurrent registration for the same username/email.
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already registered",
+        ) from err
     await db.refresh(new_user)
     return new_user
 
@@ -95,20 +122,25 @@ async def create_user(user: UserCreate, db: Annotated[AsyncSession, Depends(get_
 @router.post("/token", response_model=Token)
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+    request: Request,
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
+    auth_rate_limiter.check(request, account=form_data.username)
     # Look up user by email (case-insensitive)
     # Note: OAuth2PasswordRequestForm uses "username" field, but we treat it as email
     result = await db.execute(
-        select(models.User).where(
-            func.lower(models.User.email) == form_data.username.lower(),
+        select(models.User.id, models.User.password_hash).where(
+            models.User.email == form_data.username.lower(),
         ),
     )
-    user = result.scalars().first()
+    user = result.first()
+    # Hand the connection back before queueing for password_hash_executor;
+    # otherwise a login burst drains the pool long before the executor's 503.
+    await db.close()
 
     # Verify user exists and password is correct
     # Don't reveal which one failed (security best practice)
-    if not user or not verify_password(form_data.password, user.password_hash):
+    if not user or not await verify_password_async(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -132,12 +164,13 @@ async def get_current_user(current_user: CurrentUser):
 @router.post("/forgot-password", status_code=status.HTTP_202_ACCEPTED)
 async def forgot_password(
     request_data: ForgotPasswordRequest,
-    background_tasks: BackgroundTasks,
+    request: Request,
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
+    auth_rate_limiter.check(request, account=request_data.email)
     result = await db.execute(
         select(models.User).where(
-            func.lower(models.User.email) == request_data.email.lower(),
+            models.User.email == request_data.email.lower(),
         ),
     )
     user = result.scalars().first()
@@ -161,14 +194,17 @@ async def forgot_password(
             expires_at=expires_at,
         )
         db.add(reset_token)
-        await db.commit()
-
-        background_tasks.add_task(
-            send_password_reset_email,
+        # Queued in the same transaction as the token, so the email survives a
+        # restart and is never sent for a token that was not saved.
+        queue_password_reset_email(
+            db,
             to_email=user.email,
             username=user.username,
             token=token,
+            expires_at=expires_at,
         )
+        await db.commit()
+        email_outbox.wake()
 
     return {
         "message": "If an account exists with this email, you will receive password reset instructions.",
@@ -178,8 +214,11 @@ async def forgot_password(
 @router.post("/reset-password", status_code=status.HTTP_200_OK)
 async def reset_password(
     request_data: ResetPasswordRequest,
+    request: Request,
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
+    # The account behind a token is unknown until it is looked up, so only the IP counts.
+    auth_rate_limiter.check(request)
     token_hash = hash_reset_token(request_data.token)
 
     result = await db.execute(
@@ -203,26 +242,37 @@ async def reset_password(
             detail="Invalid or expired reset token",
         )
 
-    result = await db.execute(
-        select(models.User).where(models.User.id == reset_token.user_id),
-    )
-    user = result.scalars().first()
+    user_id = reset_token.user_id
+    # No connection is held while the new password is hashed, so the token is
+    # claimed afterwards; of two resets racing with it, only one gets it.
+    await db.close()
+    password_hash = await hash_password_async(request_data.new_password)
 
-    if not user:
+    claimed = await db.execute(
+        sql_delete(models.PasswordResetToken).where(
+            models.PasswordResetToken.token_hash == token_hash,
+        ),
+    )
+    updated = await db.execute(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(password_hash=password_hash),
+    )
+    if not claimed.rowcount or not updated.rowcount:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired reset token",
         )
 
-    user.password_hash = hash_password(request_data.new_password)
-
     await db.execute(
         sql_delete(models.PasswordResetToken).where(
-            models.PasswordResetToken.user_id == user.id,
+            models.PasswordResetToken.user_id == user_id,
         ),
     )
 
     await db.commit()
+    invalidate_cached_user(user_id)
     return {
         "message": "Password reset successfully. You can now log in with your new password.",
     }
@@ -234,29 +284,49 @@ async def change_password(
     current_user: CurrentUser,
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
-    if not verify_password(password_data.current_password, current_user.password_hash):
+    user_id = current_user.id
+    current_hash = current_user.password_hash
+    # Loading current_user may have checked out a connection; return it before
+    # both hashes, and write the new one with a fresh transaction afterwards.
+    await db.close()
+    if not await verify_password_async(password_data.current_password, current_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect",
         )
 
-    current_user.password_hash = hash_password(password_data.new_password)
+    password_hash = await hash_password_async(password_data.new_password)
 
+    await db.execute(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(password_hash=password_hash),
+    )
     await db.execute(
         sql_delete(models.PasswordResetToken).where(
-            models.PasswordResetToken.user_id == current_user.id,
+            models.PasswordResetToken.user_id == user_id,
         ),
     )
 
     await db.commit()
+    invalidate_cached_user(user_id)
     return {"message": "Password changed successfully"}
 
 
 @router.get("/{user_id}", response_model=UserPublic)
-async def get_user(user_id: int, db: Annotated[AsyncSession, Depends(get_db)]):
+async def get_user(
+    user_id: int,
+    request: Request,
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+):
     result = await db.execute(select(models.User).where(models.User.id == user_id))
     user = result.scalars().first()
     if user:
+        etag = make_etag(user.id, user.updated_at)
+        if not_modified := not_modified_response(request, etag, user.updated_at):
+            return not_modified
+        response.headers.update(validator_headers(etag, user.updated_at))
         return user
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
@@ -264,43 +334,37 @@ async def get_user(user_id: int, db: Annotated[AsyncSession, Depends(get_db)]):
 @router.get("/{user_id}/posts", response_model=PaginatedPostsResponse)
 async def get_user_posts(
     user_id: int,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     skip: Annotated[int, Query(ge=0)] = 0,
     limit: Annotated[int, Query(ge=1, le=100)] = settings.posts_per_page,
+    cursor: str | None = None,
 ):
-    result = await db.execute(select(models.User).where(models.User.id == user_id))
-    user = result.scalars().first()
+    user, (posts, total, has_more, next_cursor) = await fetch_user_feed(
+        db,
+        user_id,
+        limit,
+        cursor=cursor,
+        skip=skip,
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found",
         )
 
-    count_result = await db.execute(
-        select(func.count())
-        .select_from(models.Post)
-        .where(models.Post.user_id == user_id),
-    )
-    total = count_result.scalar() or 0
-
-    result = await db.execute(
-        select(models.Post)
-        .options(selectinload(models.Post.author))
-        .where(models.Post.user_id == user_id)
-        .order_by(models.Post.date_posted.desc())
-        .offset(skip)
-        .limit(limit),
-    )
-    posts = result.scalars().all()
+    etag = make_etag(total, skip, limit, cursor, has_more, [post_version(post) for post in posts])
+    if not_modified := not_modified_response(request, etag):
+        return not_modified
 
-    has_more = skip + len(posts) < total
-
-    return PaginatedPostsResponse(
-        posts=[PostResponse.model_validate(post) for post in posts],
+    return paginated_posts_response(
+        posts,
         total=total,
         skip=skip,
         limit=limit,
         has_more=has_more,
+        next_cursor=next_cursor,
+        headers=validator_headers(etag),
     )
 
 
@@ -345,7 +409,7 @@ async def update_user(
     ):
         result = await db.execute(
             select(models.User).where(
-                func.lower(models.User.email) == user_update.email.lower(),
+                models.User.email == user_update.email.lower(),
             ),
         )
         existing_email = result.scalars().first()
@@ -360,7 +424,16 @@ async def update_user(
     if user_update.email is not None:
         user.email = user_update.email.lower()
 
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError as err:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already registered",
+        ) from err
+    invalidate_cached_user(user.id)
+    invalidate_user_pages(user.id)
     await db.refresh(user)
     return user
 
@@ -387,11 +460,16 @@ async def delete_user(
 
     old_filename = user.image_file
 
+    await adjust_global_post_count(db, -user.post_count)
     await db.delete(user)
     await db.commit()
+    invalidate_cached_user(user_id)
+    invalidate_user_pages(user_id)
 
     if old_filename:
-        await delete_profile_image(old_filename)
+        async with profile_image_lock(db, old_filename):
+            if not await profile_image_in_use(db, old_filename):
+                await delete_profile_image(old_filename)
 
 
 @router.patch("/{user_id}/picture", response_model=UserPrivate)
@@ -407,42 +485,40 @@ async def upload_profile_picture(
             detail="Not authorized to update this user's picture",
         )
 
-    content = await file.read()
-
-    if len(content) > settings.max_upload_size_bytes:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File too large. Maximum size is {settings.max_upload_size_bytes // (1024 * 1024)}MB",
-        )
-
-    try:
-        processed_bytes, new_filename = await run_in_threadpool(
-            process_profile_image,
-            content,
-        )
-    except UnidentifiedImageError as err:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid image file. Please upload a valid image (JPEG, PNG, GIF, WebP).",
-        ) from err
-
-    # Upload to S3 (also runs in threadpool via async wrapper)
-    try:
-        await upload_profile_image(processed_bytes, new_filename)
-    except ClientError as err:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to upload image. Please try again.",
-        ) from err
+    content = await read_image_upload(file, settings.max_upload_size_bytes)
 
+    # Pictures are named by content hash, so an upload that some user already
+    # has is stored once and shared instead of being processed again.
+    new_filename = await run_in_threadpool(profile_image_name, content)
     old_filename = current_user.image_file
-
-    current_user.image_file = new_filename
-    await db.commit()
+    if new_filename == old_filename:
+        return current_user
+
+    async with profile_image_lock(db, new_filename):
+        if not await profile_image_in_use(db, new_filename):
+            try:
+                variants, new_filename = await process_profile_image_async(content)
+            except (UnidentifiedImageError, Image.DecompressionBombError) as err:
+                raise invalid_image() from err
+
+            try:
+                await upload_profile_image(variants)
+            except StorageError as err:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Failed to upload image. Please try again.",
+                ) from err
+
+        current_user.image_file = new_filename
+        await db.commit()
+    invalidate_cached_user(current_user.id)
+    invalidate_user_pages(current_user.id)
     await db.refresh(current_user)
 
     if old_filename:
-        await delete_profile_image(old_filename)
+        async with profile_image_lock(db, old_filename):
+            if not await profile_image_in_use(db, old_filename):
+                await delete_profile_image(old_filename)
 
     return current_user
 
@@ -469,8 +545,12 @@ async def delete_user_picture(
 
     current_user.image_file = None
     await db.commit()
+    invalidate_cached_user(current_user.id)
+    invalidate_user_pages(current_user.id)
     await db.refresh(current_user)
 
-    await delete_profile_image(old_filename)
+    async with profile_image_lock(db, old_filename):
+        if not await profile_image_in_use(db, old_filename):
+            await delete_profile_image(old_filename)
 
     return current_user
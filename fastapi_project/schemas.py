@@ -16,6 +16,7 @@ class UserPublic(BaseModel):
     username:str
     image_file: str | None
     image_path: str 
+    image_srcset: str
     
 class UserPrivate(UserPublic):
     email:EmailStr
@@ -54,16 +55,52 @@ class PostResponse(PostBase):
     id: int
     user_id: int
     date_posted: datetime
+    likes: int
     author: UserPublic
 
 
+class PostLikeResponse(BaseModel):
+    post_id: int
+    liked: bool
+    likes: int
+
+
+MAX_BATCH_POSTS = 100
+
+class PostBatchCreate(BaseModel):
+    posts: list[PostCreate] = Field(min_length=1, max_length=MAX_BATCH_POSTS)
+
+class PostBatchResult(BaseModel):
+    index: int
+    post: PostResponse
+
+class PostBatchResponse(BaseModel):
+    created: int
+    results: list[PostBatchResult]
+
+
 class PaginatedPostsResponse(BaseModel):
     posts: list[PostResponse]
     total: int
     skip: int
     limit: int
     has_more: bool
+    next_cursor: str | None = None
     
+class PostSearchHit(BaseModel):
+    post: PostResponse
+    # HTML-escaped text with matched terms wrapped in <mark> tags.
+    title_highlight: str
+    content_highlight: str
+
+
+class PostSearchResponse(BaseModel):
+    results: list[PostSearchHit]
+    limit: int
+    has_more: bool
+    next_cursor: str | None = None
+
+
 class ForgotPasswordRequest(BaseModel):
     email:EmailStr = Field(max_length=120)
     
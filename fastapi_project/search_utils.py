@@ -0,0 +1,162 @@
+import html
+import re
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, column, func, literal_column, select, table, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+
+import models
+from feed_utils import decode_position, encode_position
+from schemas import PostSearchHit, PostSearchResponse
+
+MAX_SEARCH_TERMS = 16
+SNIPPET_WORDS = 32
+
+# Private-use characters mark matches in the raw highlight text; they are swapped
+# for <mark> tags after the text itself has been HTML-escaped.
+MARK_START = "\ue000"
+MARK_END = "\ue001"
+
+# SQLite FTS5 index created by the DDL in models.py. Its hidden rank column is
+# configured as bm25(10.0, 1.0), where lower values are better matches.
+posts_fts = table("posts_fts", column("rowid"), column("rank"))
+posts_fts_match = literal_column("posts_fts").match
+
+_WORD = re.compile(r"\w+")
+
+
+def search_terms(q: str) -> list[str]:
+    terms = _WORD.findall(q)[:MAX_SEARCH_TERMS]
+    if not terms:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Search query must contain at least one word",
+        )
+    return terms
+
+
+def _decode_search_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        score, post_id = decode_position(cursor)
+        return float(score), int(post_id)
+    except (ValueError, TypeError) as err:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor",
+        ) from err
+
+
+def sqlite_search_query(q: str, limit: int, cursor: str | None = None) -> Select:
+    """FTS5 search: rank and page the matches first, then highlight only that page."""
+    # Each term is quoted so user input can never be parsed as FTS5 query syntax.
+    match = posts_fts_match(" ".join(f'"{term}"' for term in search_terms(q)))
+
+    page = select(
+        posts_fts.c.rowid.label("post_id"),
+        posts_fts.c.rank.label("score"),
+    ).where(match)
+    if cursor is not None:
+        page = page.where(tuple_(posts_fts.c.rank, posts_fts.c.rowid) > _decode_search_cursor(cursor))
+    page = page.order_by(posts_fts.c.rank, posts_fts.c.rowid).limit(limit + 1).subquery("page")
+
+    def highlighted(function: str, *args: object):
+        # A correlated lookup by rowid plus MATCH gives highlight() and snippet()
+        # their FTS5 context for just the rows on this page.
+        return (
+            select(getattr(func, function)(literal_column("posts_fts"), *args))
+            .where(match, posts_fts.c.rowid == page.c.post_id)
+            .scalar_subquery()
+        )
+
+    return (
+        select(
+            models.Post,
+            page.c.score,
+            highlighted("highlight", 0, MARK_START, MARK_END).label("title_highlight"),
+            highlighted("snippet", 1, MARK_START, MARK_END, "…", SNIPPET_WORDS).label(
+                "content_highlight",
+            ),
+        )
+        .select_from(page)
+        .join(models.Post, models.Post.id == page.c.post_id)
+        .join(models.Post.author)
+        .options(contains_eager(models.Post.author))
+        .order_by(page.c.score, page.c.post_id)
+    )
+
+
+def postgres_search_query(q: str, limit: int, cursor: str | None = None) -> Select:
+    """tsvector search against the ix_posts_search GIN index, highlighted with ts_headline."""
+    search_terms(q)
+    query = func.websearch_to_tsquery(models.POST_SEARCH_CONFIG, q)
+    # Negated so that, as with FTS5's bm25, lower scores sort first.
+    score = -func.ts_rank_cd(models.post_search_vector, query)
+
+    page = select(
+        models.Post.id.label("post_id"),
+        score.label("score"),
+    ).where(models.post_search_vector.bool_op("@@")(query))
+    if cursor is not None:
+        page = page.where(tuple_(score, models.Post.id) > _decode_search_cursor(cursor))
+    page = page.order_by(score, models.Post.id).limit(limit + 1).subquery("page")
+
+    marks = f"StartSel={MARK_START}, StopSel={MARK_END}"
+    return (
+        select(
+            models.Post,
+            page.c.score,
+            func.ts_headline(
+                models.POST_SEARCH_CONFIG,
+                models.Post.title,
+                query,
+                f"{marks}, HighlightAll=true",
+            ).label("title_highlight"),
+            func.ts_headline(
+                models.POST_SEARCH_CONFIG,
+                models.Post.content,
+                query,
+                f"{marks}, MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 2}",
+            ).label("content_highlight"),
+        )
+        .select_from(page)
+        .join(models.Post, models.Post.id == page.c.post_id)
+        .join(models.Post.author)
+        .options(contains_eager(models.Post.author))
+        .order_by(page.c.score, page.c.post_id)
+    )
+
+
+def render_highlight(text: str) -> str:
+    return html.escape(text).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+async def search_posts_page(
+    db: AsyncSession,
+    q: str,
+    limit: int,
+    cursor: str | None = None,
+) -> PostSearchResponse:
+    """Return one page of posts matching q, best match first."""
+    if db.bind.dialect.name == "postgresql":
+        query = postgres_search_query(q, limit, cursor)
+    else:
+        query = sqlite_search_query(q, limit, cursor)
+
+    rows = (await db.execute(query)).all()
+    page = rows[:limit]
+    has_more = len(rows) > limit
+    next_cursor = encode_position(page[-1].score, page[-1].Post.id) if has_more else None
+    return PostSearchResponse(
+        results=[
+            PostSearchHit(
+                post=row.Post,
+                title_highlight=render_highlight(row.title_highlight),
+                content_highlight=render_highlight(row.content_highlight),
+            )
+            for row in page
+        ],
+        limit=limit,
+        has_more=has_more,
+        next_cursor=next_cursor,
+    )
@@ -0,0 +1,184 @@
+"""Fingerprinted, precompressed static assets.
+
+python static_assets.py copies every file under static/ into static/dist/
+with a content hash in its name (css/main.css -> dist/css/main.1a2b3c4d5e6f.css),
+writes .br and .gz siblings for text formats and records both in
+static/dist/manifest.json. Templates link assets through asset_url(), which
+falls back to the plain /static URL when there is no build, so a fresh
+checkout still works.
+"""
+import gzip
+import hashlib
+import json
+import re
+import shutil
+from pathlib import Path
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from config import settings
+
+try:
+    import brotli
+except ImportError:  # Optional: without it the build only writes .gz files.
+    brotli = None
+
+STATIC_URL = "/static"
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".svg", ".ico", ".json", ".webmanifest", ".txt"}
+# Preferred first; each maps to the sibling file's suffix.
+PRECOMPRESSED_ENCODINGS = {"br": ".br", "gzip": ".gz"}
+# A compressed copy that saves less than this is not worth a Vary: Accept-Encoding.
+MIN_COMPRESSION_SAVING = 0.1
+
+# Content-addressed profile picture variants, see image_utils.profile_image_name.
+PROFILE_IMAGE_VARIANT = re.compile(r"profile_pics/[0-9a-f]{32}_\d+\.\w+")
+
+
+def fingerprinted_name(path: Path, content: bytes) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    return f"{path.stem}.{digest}{path.suffix}"
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(content, quality=11)
+    # mtime=0 keeps rebuilds of unchanged files byte-identical.
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def build_assets(static_dir: Path) -> dict:
+    """Rebuild static_dir/dist from scratch and return the manifest written there."""
+    dist = static_dir / DIST_DIR
+    shutil.rmtree(dist, ignore_errors=True)
+    encodings = [name for name in PRECOMPRESSED_ENCODINGS if name != "br" or brotli is not None]
+    manifest = {"assets": {}, "encodings": {}}
+
+    for source in sorted(static_dir.rglob("*")):
+        relative = source.relative_to(static_dir)
+        if not source.is_file() or relative.parts[0] == DIST_DIR:
+            continue
+        content = source.read_bytes()
+        target = Path(DIST_DIR) / relative.parent / fingerprinted_name(relative, content)
+        (static_dir / target).parent.mkdir(parents=True, exist_ok=True)
+        (static_dir / target).write_bytes(content)
+        manifest["assets"][relative.as_posix()] = target.as_posix()
+
+        if source.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+        written = []
+        for encoding in encodings:
+            compressed = compress(content, encoding)
+            if len(compressed) <= len(content) * (1 - MIN_COMPRESSION_SAVING):
+                (static_dir / f"{target}{PRECOMPRESSED_ENCODINGS[encoding]}").write_bytes(compressed)
+                written.append(encoding)
+        if written:
+            manifest["encodings"][target.as_posix()] = written
+
+    (dist / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return manifest
+
+
+def load_manifest(static_dir: Path) -> dict:
+    try:
+        return json.loads((static_dir / DIST_DIR / MANIFEST_NAME).read_text())
+    except FileNotFoundError:
+        return {"assets": {}, "encodings": {}}
+
+
+asset_manifest = load_manifest(Path(settings.static_dir))
+
+
+def asset_url(path: str) -> str:
+    """URL of a file under static/, fingerprinted when the assets are built."""
+    path = path.lstrip("/")
+    return f"{STATIC_URL}/{asset_manifest['assets'].get(path, path)}"
+
+
+def import_map() -> str:
+    """Import map sending /static/js/*.js module imports to their fingerprinted files."""
+    imports = {
+        f"{STATIC_URL}/{path}": f"{STATIC_URL}/{built}"
+        for path, built in asset_manifest["assets"].items()
+        if path.endswith(".js")
+    }
+    return json.dumps({"imports": imports})
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = params.strip().removeprefix("q=")
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that marks content-addressed files immutable.
+
+    Paths matching immutable_pattern never change, so they get a one-year
+    Cache-Control: immutable and browsers stop revalidating them. Paths listed
+    in precompressed are served from their .br/.gz sibling when the client
+    accepts it, with no compression work at request time.
+    """
+
+    def __init__(
+        self,
+        *,
+        directory: str,
+        immutable_pattern: str,
+        precompressed: dict[str, list[str]] | None = None,
+    ) -> None:
+        super().__init__(directory=directory)
+        self.immutable_pattern = re.compile(immutable_pattern)
+        self.precompressed = precompressed or {}
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        available = self.precompressed.get(path)
+        encoding = None
+        if available:
+            accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+            encoding = next((name for name in available if name in accepted), None)
+
+        if encoding is None:
+            response = await super().get_response(path, scope)
+        else:
+            # FileResponse guesses text/css for main.css.br, so only the
+            # encoding needs adding.
+            response = await super().get_response(path + PRECOMPRESSED_ENCODINGS[encoding], scope)
+            response.headers["Content-Encoding"] = encoding
+        if available:
+            response.headers["Vary"] = "Accept-Encoding"
+        if self.immutable_pattern.fullmatch(path):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+def static_files() -> CachedStaticFiles:
+    return CachedStaticFiles(
+        directory=settings.static_dir,
+        immutable_pattern=rf"{DIST_DIR}/.+",
+        precompressed=asset_manifest["encodings"],
+    )
+
+
+def media_files() -> CachedStaticFiles:
+    return CachedStaticFiles(directory="media", immutable_pattern=PROFILE_IMAGE_VARIANT.pattern)
+
+
+if __name__ == "__main__":
+    built = build_assets(Path(settings.static_dir))
+    print(f"{len(built['assets'])} assets, {len(built['encodings'])} precompressed "
+          f"({', '.join(name for name in PRECOMPRESSED_ENCODINGS if name != 'br' or brotli)})")
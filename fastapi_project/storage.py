@@ -0,0 +1,217 @@
+"""Where uploaded media lives: the local media/ folder or an S3 bucket.
+
+Both backends expose the same async interface and never block the event loop;
+media_storage is the one selected by settings (S3 when s3_bucket_name is set).
+"""
+import asyncio
+import os
+import tempfile
+import threading
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+from pathlib import Path
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+from config import settings
+
+# S3 DeleteObjects accepts at most this many keys per request.
+S3_DELETE_BATCH_SIZE = 1000
+
+
+class StorageError(Exception):
+    """A media backend failed to store or delete an object."""
+
+
+class LocalMediaStorage:
+    """Files under a local directory, served by the /media static mount.
+
+    File I/O runs in the default thread pool. Writes go to a temporary file
+    that is renamed into place, so a half-written file is never served.
+    """
+
+    def __init__(self, root: Path, base_url: str = "/media") -> None:
+        self.root = root
+        self.base_url = base_url
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def _put_sync(self, key: str, content: bytes) -> None:
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(content)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def _delete_many_sync(self, keys: list[str]) -> None:
+        for key in keys:
+            (self.root / key).unlink(missing_ok=True)
+
+    async def put(
+        self,
+        key: str,
+        content: bytes,
+        content_type: str,
+        cache_control: str | None = None,
+    ) -> None:
+        try:
+            await asyncio.to_thread(self._put_sync, key, content)
+        except OSError as err:
+            raise StorageError(f"Could not write {key}") from err
+
+    async def delete_many(self, keys: Iterable[str]) -> None:
+        try:
+            await asyncio.to_thread(self._delete_many_sync, list(keys))
+        except OSError as err:
+            raise StorageError("Could not delete media files") from err
+
+    async def close(self) -> None:
+        pass
+
+
+class S3MediaStorage:
+    """Objects in an S3 bucket, or any S3-compatible service via endpoint_url.
+
+    boto3 calls run on a dedicated thread pool sized to the client's connection
+    pool, so S3 latency never ties up the event loop or the shared thread pool
+    that serves sync endpoints. Objects above multipart_threshold are uploaded
+    in parallel parts; deletes go out in batches of up to 1000 keys.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        region: str,
+        endpoint_url: str | None = None,
+        public_url: str | None = None,
+        max_concurrency: int = 10,
+        multipart_threshold: int = 8 * 1024 * 1024,
+    ) -> None:
+        self.bucket = bucket
+        self.region = region
+        self.endpoint_url = endpoint_url
+        self.max_concurrency = max_concurrency
+        self.multipart_threshold = multipart_threshold
+        if public_url:
+            self.public_url = public_url.rstrip("/")
+        elif endpoint_url:
+            # S3-compatible stand-ins are addressed path-style.
+            self.public_url = f"{endpoint_url.rstrip('/')}/{bucket}"
+        else:
+            self.public_url = f"https://{bucket}.s3.{region}.amazonaws.com"
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix="s3-storage",
+        )
+
+    def url(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+    @property
+    def client(self):
+        # Building a client resolves credentials and loads botocore's service
+        # model, which blocks; _call only touches it from self._executor.
+        with self._client_lock:
+            if self._client is None:
+                self._client = boto3.client(
+                    "s3",
+                    region_name=self.region,
+                    endpoint_url=self.endpoint_url,
+                    config=Config(max_pool_connections=self.max_concurrency),
+                )
+        return self._client
+
+    def _invoke(self, method: str, *args, **kwargs):
+        return getattr(self.client, method)(*args, **kwargs)
+
+    async def _call(self, method: str, *args, **kwargs):
+        """Run a client method, named so the client is resolved off the event loop."""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, partial(self._invoke, method, *args, **kwargs))
+        except (BotoCoreError, ClientError) as err:
+            raise StorageError(str(err)) from err
+
+    async def put(
+        self,
+        key: str,
+        content: bytes,
+        content_type: str,
+        cache_control: str | None = None,
+    ) -> None:
+        extra_args = {"ContentType": content_type}
+        if cache_control:
+            extra_args["CacheControl"] = cache_control
+        if len(content) < self.multipart_threshold:
+            await self._call(
+                "put_object",
+                Bucket=self.bucket,
+                Key=key,
+                Body=content,
+                **extra_args,
+            )
+            return
+        # upload_fileobj splits the body into parts and sends them in parallel.
+        await self._call(
+            "upload_fileobj",
+            BytesIO(content),
+            self.bucket,
+            key,
+            ExtraArgs=extra_args,
+            Config=TransferConfig(
+                multipart_threshold=self.multipart_threshold,
+                multipart_chunksize=self.multipart_threshold,
+                max_concurrency=self.max_concurrency,
+            ),
+        )
+
+    async def delete_many(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        batches = [
+            keys[start:start + S3_DELETE_BATCH_SIZE]
+            for start in range(0, len(keys), S3_DELETE_BATCH_SIZE)
+        ]
+        results = await asyncio.gather(
+            *(
+                self._call(
+                    "delete_objects",
+                    Bucket=self.bucket,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                )
+                for batch in batches
+            ),
+        )
+        errors = [error for result in results for error in result.get("Errors", [])]
+        if errors:
+            raise StorageError(f"Could not delete {len(errors)} objects, e.g. {errors[0]}")
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+def create_media_storage() -> LocalMediaStorage | S3MediaStorage:
+    if settings.s3_bucket_name:
+        return S3MediaStorage(
+            settings.s3_bucket_name,
+            settings.s3_region,
+            endpoint_url=settings.s3_endpoint_url,
+            public_url=settings.s3_public_url,
+            max_concurrency=settings.s3_max_concurrency,
+        )
+    return LocalMediaStorage(Path("media"))
+
+
+media_storage = create_media_storage()
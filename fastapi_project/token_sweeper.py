@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from datetime import UTC, datetime
+
+from sqlalchemy import delete, select
+
+import models
+from config import settings
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiredTokenSweeper:
+    """Periodically deletes expired models.PasswordResetToken rows.
+
+    reset_password only removes an expired token when someone tries to use
+    it, so abandoned ones would otherwise stay forever. Outbox mails carrying
+    those tokens expire with them and go in the same run, including parked
+    ones the outbox worker no longer looks at. Each run deletes in
+    batches of batch_size rows, oldest first, one short transaction per batch
+    with a pause in between, so login and reset traffic never waits long
+    behind the sweep. On PostgreSQL rows locked by a concurrent reset are
+    skipped and picked up next run.
+    """
+
+    def __init__(self, interval: float, batch_size: int, pause: float) -> None:
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self._sweep_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self.runs = 0
+        self.rows_removed = 0
+        self.outbox_rows_removed = 0
+        self.last_run_rows = 0
+        self.last_run_batches = 0
+        self.last_run_ms = 0.0
+
+    async def _delete_batch(
+        self,
+        model: type[models.PasswordResetToken] | type[models.EmailOutbox],
+        now: datetime,
+    ) -> int:
+        expired = (
+            select(model.id)
+            .where(model.expires_at < now)
+            .order_by(model.expires_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with engine.begin() as conn:
+            result = await conn.execute(delete(model).where(model.id.in_(expired)))
+        return result.rowcount
+
+    async def _delete_expired(
+        self,
+        model: type[models.PasswordResetToken] | type[models.EmailOutbox],
+        now: datetime,
+    ) -> tuple[int, int]:
+        removed = batches = 0
+        while True:
+            deleted = await self._delete_batch(model, now)
+            removed += deleted
+            batches += 1
+            if deleted < self.batch_size:
+                return removed, batches
+            await asyncio.sleep(self.pause)
+
+    async def sweep(self) -> int:
+        """Delete every token that has expired; returns how many rows went."""
+        async with self._sweep_lock:
+            started = time.perf_counter()
+            # Fixed for the whole run, so tokens expiring mid-sweep wait for the next one.
+            now = datetime.now(UTC)
+            removed, batches = await self._delete_expired(models.PasswordResetToken, now)
+            outbox_removed, outbox_batches = await self._delete_expired(models.EmailOutbox, now)
+            batches += outbox_batches
+
+            self.runs += 1
+            self.outbox_rows_removed += outbox_removed
+            self.rows_removed += removed
+            self.last_run_rows = removed
+            self.last_run_batches = batches
+            self.last_run_ms = (time.perf_counter() - started) * 1000
+            if removed:
+                logger.info("Removed %d expired password reset tokens in %d batches", removed, batches)
+            if outbox_removed:
+                logger.info("Removed %d expired outbox emails", outbox_removed)
+            return removed
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Failed to sweep expired password reset tokens")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "runs": self.runs,
+            "rows_removed": self.rows_removed,
+            "outbox_rows_removed": self.outbox_rows_removed,
+            "last_run_rows": self.last_run_rows,
+            "last_run_batches": self.last_run_batches,
+            "last_run_ms": round(self.last_run_ms, 3),
+        }
+
+
+reset_token_sweeper = ExpiredTokenSweeper(
+    interval=settings.reset_token_sweep_interval_seconds,
+    batch_size=settings.reset_token_sweep_batch_size,
+    pause=settings.reset_token_sweep_pause_seconds,
+)
+
+
+async def main() -> None:
+    removed = await reset_token_sweeper.sweep()
+    await engine.dispose()
+    print(f"Removed {removed} expired password reset tokens")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())